@@ -0,0 +1,90 @@
+"""Cold-start cost of importing the app, from ``python -X importtime``.
+
+Imports ``server`` in a fresh interpreter and reports the total import time
+and the slowest top-level packages it pulls in. Integrations that are meant
+to load lazily are listed separately: any of them showing up is a
+regression.
+
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --top 25 --repeat 5
+"""
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Only needed once a request uses them; see server.cloudinary_utils, payments, password_pool
+LAZY_PACKAGES = ("cloudinary", "emergentintegrations", "passlib", "bcrypt", "pypdf", "stripe", "litellm", "openai")
+
+
+def parse(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds per top-level package imported by ``server``."""
+    # Children are printed before their parent, indented two spaces per level
+    children: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == "server":
+                return {**children, "server": int(cumulative)}
+            children = {}
+    return {}
+
+
+def measure(repeat: int = 3) -> dict:
+    env = {
+        **os.environ,
+        "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+        "DB_NAME": os.environ.get("DB_NAME", "mitteie_bench"),
+    }
+    runs: List[Dict[str, int]] = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import server"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        runs.append(parse(result.stderr))
+
+    # The fastest run has the least noise from the machine
+    best = min(runs, key=lambda packages: packages.get("server", 0))
+    imported = set().union(*runs)
+    return {
+        "total_ms": best.get("server", 0) / 1000,
+        "packages_ms": {name: us / 1000 for name, us in best.items() if name != "server"},
+        "eager_lazy_packages": sorted(
+            name for name in imported
+            if name.split(".")[0] in LAZY_PACKAGES
+        ),
+    }
+
+
+def print_report(report: dict, top: int = 15):
+    print(f"\nimport server: {report['total_ms']:.1f} ms")
+    slowest = sorted(report["packages_ms"].items(), key=lambda item: -item[1])[:top]
+    for name, ms in slowest:
+        print(f"  {ms:>8.1f} ms  {name}")
+    if report["eager_lazy_packages"]:
+        print(f"  imported eagerly but meant to be lazy: {', '.join(report['eager_lazy_packages'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start cost of importing the app.")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = measure(args.repeat)
+    print_report(report, args.top)
+    return 1 if report["eager_lazy_packages"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""Concurrent load test and benchmark for the API.
+
+Seeds a scratch database, runs the functional checks, then drives
+concurrent scenarios and reports latency percentiles, throughput and
+MongoDB commands per operation (read from the Server-Timing header).
+
+By default the app runs in-process through httpx's ASGI transport against
+the MongoDB at MONGO_URL. With --url a running server is driven instead; it
+must use the same database (DB_NAME=mitteie_bench), as the seed is written
+directly.
+
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --items 100000 --scenarios dashboard export
+    python benchmarks/loadtest.py --save-baseline
+
+Results are compared with benchmarks/baseline.json when it exists; the exit
+status is 1 if a scenario regressed beyond --tolerance, 2 if a functional
+check failed.
+"""
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "mitteie_bench")
+
+import httpx
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+PASSWORD = "bench-password-123"
+SERVER_TIMING_OPS = re.compile(r'desc="(\d+) commands"')
+
+
+class CheckFailed(Exception):
+    pass
+
+
+class Operation:
+    """Timing of one scenario operation, which may span several requests."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.db_ops = 0
+        self.failed = False
+
+    async def request(self, method: str, url: str, expect: int = 200, **kwargs) -> httpx.Response:
+        response = await self.client.request(method, url, **kwargs)
+        match = SERVER_TIMING_OPS.search(response.headers.get("server-timing", ""))
+        if match:
+            self.db_ops += int(match.group(1))
+        if response.status_code != expect:
+            self.failed = True
+        return response
+
+
+# ========== SCENARIOS ==========
+# Each scenario is one user action; ``user`` is a seeded user dict from seed.py
+
+def auth(user: dict) -> dict:
+    return {"Authorization": f"Bearer {user['token']}"}
+
+
+async def login(op: Operation, user: dict, rng: random.Random):
+    await op.request("POST", "/api/auth/login", json={"email": user["email"], "password": user["password"]})
+
+
+async def dashboard(op: Operation, user: dict, rng: random.Random):
+    # What the dashboard fetches on load
+    await op.request("GET", "/api/auth/me", headers=auth(user))
+    await op.request("GET", "/api/items", params={"limit": 100}, headers=auth(user))
+    await op.request("GET", "/api/items/summary", headers=auth(user))
+
+
+async def item_edit(op: Operation, user: dict, rng: random.Random):
+    item_id = rng.choice(user["item_ids"])
+    await op.request("PATCH", f"/api/items/{item_id}", json={"notat": f"Sjekket {uuid.uuid4().hex[:6]}"}, headers=auth(user))
+
+
+async def search(op: Operation, user: dict, rng: random.Random):
+    q = rng.choice(["sofa", "TV", "ring", "sykkel", "A12", "K3"])
+    await op.request("GET", "/api/items/search", params={"q": q}, headers=auth(user))
+
+
+async def export(op: Operation, user: dict, rng: random.Random):
+    await op.request("GET", "/api/items/export", params={"format": "csv"}, headers=auth(user))
+
+
+# name: (scenario, operations, concurrency, user pool). Logins get their own
+# accounts: a burst goes past the per-user session cap and would otherwise
+# revoke the sessions the other scenarios use.
+SCENARIOS: Dict[str, tuple] = {
+    "login_burst": (login, 100, 20, "login"),
+    "dashboard": (dashboard, 500, 50, "inventory"),
+    "item_edit": (item_edit, 300, 20, "inventory"),
+    "search": (search, 200, 20, "inventory"),
+    "export": (export, 10, 2, "inventory"),
+}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    users: List[dict],
+    scenario: Callable[..., Awaitable[None]],
+    operations: int,
+    concurrency: int,
+) -> dict:
+    rng = random.Random(7)
+    latencies: List[float] = []
+    db_ops: List[int] = []
+    errors = 0
+    remaining = iter(range(operations))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            op = Operation(client)
+            start = time.perf_counter()
+            try:
+                await scenario(op, rng.choice(users), rng)
+            except httpx.HTTPError:
+                op.failed = True
+            latencies.append(time.perf_counter() - start)
+            db_ops.append(op.db_ops)
+            errors += op.failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "operations": operations,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput": operations / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "db_ops": sum(db_ops) / len(db_ops),
+    }
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    # Nearest rank
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# ========== FUNCTIONAL CHECKS ==========
+
+async def run_checks(client: httpx.AsyncClient):
+    """The request/response checks that used to live in backend_test.py."""
+
+    async def check(name: str, response: httpx.Response, expected: int) -> dict:
+        if response.status_code != expected:
+            raise CheckFailed(f"{name}: expected {expected}, got {response.status_code}: {response.text[:200]}")
+        return response.json() if response.content else {}
+
+    email = f"check_{uuid.uuid4().hex[:8]}@example.com"
+    signup = await check("signup", await client.post(
+        "/api/auth/signup", json={"email": email, "password": PASSWORD, "name": "Check User"}
+    ), 200)
+    if signup["email"] != email:
+        raise CheckFailed("signup: wrong user")
+    login = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    await check("login", login, 200)
+    token = login.cookies.get("session_token")
+    # Authenticate explicitly from here on, not through the cookie jar
+    client.cookies.clear()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    me = await check("auth/me", await client.get("/api/auth/me", headers=headers), 200)
+    if me["email"] != email:
+        raise CheckFailed("auth/me: wrong user")
+
+    item = await check("create item", await client.post("/api/items", json={
+        "navn": "Test TV", "kategori": "Elektronikk", "serienummer": "SN123456",
+        "notat": "Kjøpt i 2024", "verdi": 15000.0, "valuta": "NOK", "vedlegg_urls": []
+    }, headers=headers), 201)
+    item_id = item["item_id"]
+
+    items = await check("list items", await client.get("/api/items", headers=headers), 200)
+    if [i["item_id"] for i in items] != [item_id]:
+        raise CheckFailed("list items: expected the created item")
+    await check("get item", await client.get(f"/api/items/{item_id}", headers=headers), 200)
+    updated = await check("update item", await client.put(
+        f"/api/items/{item_id}", json={"navn": "Oppdatert TV", "verdi": 12000.0}, headers=headers
+    ), 200)
+    if updated["navn"] != "Oppdatert TV":
+        raise CheckFailed("update item: change not applied")
+    await check("delete item", await client.delete(f"/api/items/{item_id}", headers=headers), 200)
+    await check("deleted item is gone", await client.get(f"/api/items/{item_id}", headers=headers), 404)
+
+    if os.environ.get("CLOUDINARY_API_SECRET"):
+        await check("cloudinary signature", await client.get("/api/cloudinary/signature", headers=headers), 200)
+
+    # Logout revokes the session named by the cookie
+    await check("logout", await client.post("/api/auth/logout", headers={"Cookie": f"session_token={token}"}), 200)
+    await check("session revoked", await client.get("/api/auth/me", headers=headers), 401)
+
+
+# ========== REPORTING ==========
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput']:.1f} ops/s vs baseline {base['throughput']:.1f} ops/s")
+        # Command counts are deterministic; any real increase is a regression
+        if result["db_ops"] > base["db_ops"] + 0.5:
+            regressions.append(f"{name}: {result['db_ops']:.1f} Mongo commands/op vs baseline {base['db_ops']:.1f}")
+    return regressions
+
+
+def print_report(results: Dict[str, dict]):
+    print(f"\n{'scenario':<12} {'ops':>6} {'conc':>5} {'err':>4} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'db/op':>6}")
+    for name, r in results.items():
+        print(
+            f"{name:<12} {r['operations']:>6} {r['concurrency']:>5} {r['errors']:>4} {r['throughput']:>8.1f} "
+            f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['db_ops']:>6.1f}"
+        )
+
+
+# ========== MAIN ==========
+
+async def main(args) -> int:
+    import server
+    from seed import seed
+
+    client_kwargs = {"timeout": 60}
+    if args.url:
+        client_kwargs["base_url"] = args.url
+    else:
+        client_kwargs["base_url"] = "http://bench"
+        client_kwargs["transport"] = httpx.ASGITransport(app=server.app)
+
+    # The seed is written directly, so a client is needed even when driving --url
+    server.connect_mongo()
+    await server.client.drop_database(os.environ["DB_NAME"])
+    if not args.url:
+        await server.startup_clients()
+
+    try:
+        async with httpx.AsyncClient(**client_kwargs) as client:
+            if not args.skip_checks:
+                try:
+                    await run_checks(client)
+                except CheckFailed as e:
+                    print(f"Functional check failed: {e}")
+                    return 2
+                print("Functional checks passed")
+
+            start = time.perf_counter()
+            pools = {
+                "inventory": await seed(server.db, args.users, args.items, PASSWORD),
+                "login": await seed(server.db, args.users, 0, PASSWORD, prefix="login"),
+            }
+            print(f"Seeded {args.users} users x {args.items} items in {time.perf_counter() - start:.1f}s")
+
+            results = {}
+            for name in args.scenarios:
+                scenario, operations, concurrency, pool = SCENARIOS[name]
+                results[name] = await run_scenario(
+                    client, pools[pool], scenario,
+                    max(1, int(operations * args.scale)),
+                    args.concurrency or concurrency
+                )
+    finally:
+        if not args.url:
+            await server.shutdown_db_client()
+
+    print_report(results)
+    report = {"users": args.users, "items": args.items, "scenarios": results}
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+        return 0
+
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+        if (baseline["users"], baseline["items"]) != (args.users, args.items):
+            print(f"\nBaseline was recorded with {baseline['users']} users x {baseline['items']} items; not compared")
+            return 0
+        regressions = compare(results, baseline["scenarios"], args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the API.")
+    parser.add_argument("--url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--items", type=int, default=1000, help="Items per user (10 to 100000)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every scenario's operation count")
+    parser.add_argument("--concurrency", type=int, help="Override every scenario's concurrency")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging a regression")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--skip-checks", action="store_true")
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
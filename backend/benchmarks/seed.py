@@ -0,0 +1,90 @@
+"""Seed users with realistic inventories for the load tests.
+
+Documents are written straight to MongoDB in the shape the API writes them,
+so seeding 100k items takes seconds rather than 100k requests. Sessions are
+created directly too; only the login scenario pays for bcrypt.
+"""
+from datetime import timedelta
+from typing import List
+import random
+import uuid
+
+from password_pool import pwd_context
+from sessions import store_session
+import server
+from timestamps import utcnow
+
+INSERT_BATCH_SIZE = 1000
+
+CATEGORIES = ["Elektronikk", "Møbler", "Smykker", "Klær", "Sport", "Verktøy", "Kunst", None]
+NAMES = {
+    "Elektronikk": ["TV", "Bærbar PC", "Mobiltelefon", "Kamera", "Høyttaler", "Nettbrett"],
+    "Møbler": ["Sofa", "Spisebord", "Stol", "Bokhylle", "Seng", "Kommode"],
+    "Smykker": ["Ring", "Halskjede", "Armbåndsur", "Øredobber"],
+    "Klær": ["Vinterjakke", "Dress", "Skinnveske", "Støvler"],
+    "Sport": ["Sykkel", "Ski", "Golfsett", "Telt"],
+    "Verktøy": ["Drill", "Sirkelsag", "Gressklipper", "Høytrykksspyler"],
+    "Kunst": ["Maleri", "Litografi", "Skulptur"],
+    None: ["Diverse", "Gave", "Arvegods"],
+}
+CURRENCIES = ["NOK"] * 18 + ["EUR", "USD"]
+
+
+def make_item_doc(rng: random.Random, user_id: str, index: int, now) -> dict:
+    kategori = rng.choice(CATEGORIES)
+    data = server.ItemCreate(
+        navn=f"{rng.choice(NAMES[kategori])} {index}",
+        kategori=kategori,
+        serienummer=f"{rng.choice('ABCDEFGHKLMNPRSTXZ')}{rng.randrange(10**7):07d}" if rng.random() < 0.6 else None,
+        notat="Kvittering i vedlegg" if rng.random() < 0.2 else None,
+        verdi=round(rng.lognormvariate(7.5, 1.2), 2) if rng.random() < 0.9 else None,
+        valuta=rng.choice(CURRENCIES),
+        vedlegg_urls=[f"https://res.cloudinary.com/demo/image/upload/v1/mitteie/{uuid.uuid4().hex}.jpg"] if rng.random() < 0.3 else [],
+    )
+    doc = server.new_item_doc(data, user_id)
+    # Spread items over a few years of history, edited some time after creation
+    created_at = now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+    doc["created_at"] = created_at
+    doc["updated_at"] = min(now, created_at + timedelta(minutes=rng.randrange(60 * 24 * 90)))
+    doc["version"] = rng.randint(1, 4)
+    return doc
+
+
+async def seed(db, users: int, items_per_user: int, password: str, prefix: str = "bench", seed_value: int = 1) -> List[dict]:
+    """Create ``users`` users with ``items_per_user`` items each.
+
+    Returns one dict per user with its credentials, a session token and the
+    ids of its items.
+    """
+    rng = random.Random(seed_value)
+    password_hash = pwd_context().hash(password)
+
+    now = utcnow()
+    seeded = []
+    for n in range(users):
+        user_id = f"user_{prefix}{n:07d}"
+        email = f"{prefix}{n}@example.com"
+        await db.users.insert_one({
+            "user_id": user_id,
+            "email": email,
+            "name": f"{prefix.title()} User {n}",
+            "password_hash": password_hash,
+            "picture": None,
+            "created_at": now - timedelta(days=400),
+        })
+
+        token = f"session_{prefix}_{uuid.uuid4().hex}"
+        await store_session(db, user_id, token, now + timedelta(days=server.SESSION_DAYS))
+
+        item_ids = []
+        for start in range(0, items_per_user, INSERT_BATCH_SIZE):
+            batch = [
+                make_item_doc(rng, user_id, index, now)
+                for index in range(start, min(start + INSERT_BATCH_SIZE, items_per_user))
+            ]
+            await db.items.insert_many(batch, ordered=False)
+            item_ids.extend(doc["item_id"] for doc in batch)
+
+        seeded.append({"user_id": user_id, "email": email, "password": password, "token": token, "item_ids": item_ids})
+
+    return seeded
@@ -0,0 +1,121 @@
+"""Per-item serialization cost of the item list response.
+
+Times the list endpoint's own rendering, ``server.item_out`` per document
+and then ``server.json_response``, with FAST_JSON off and on. Both are
+compared with the route as it was before: ``Item`` models re-validated
+against ``response_model=List[Item]`` by FastAPI. Needs no database:
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --sizes 1000 10000 --repeat 5
+"""
+from dataclasses import replace
+from datetime import timedelta
+from pathlib import Path
+from typing import List
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from bson.tz_util import utc
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from timestamps import utcnow
+import server
+
+
+def make_docs(count: int) -> list:
+    # Shaped like documents read back through Motor with tz_aware=True
+    now = utcnow().replace(tzinfo=utc)
+    return [
+        {
+            "item_id": f"item_{i:012x}",
+            "user_id": "user_benchmark",
+            "navn": f"Gjenstand {i}",
+            "kategori": ("Elektronikk", "Møbler", "Smykker", None)[i % 4],
+            "serienummer": f"SN-{i:08d}",
+            "serienummer_key": f"SN{i:08d}",
+            "notat": "Kjøpt på salg" if i % 3 == 0 else None,
+            "verdi": 1000 + i * 12.5,
+            "valuta": "NOK",
+            "vedlegg_urls": [f"https://res.cloudinary.com/demo/image/upload/{i}.jpg"] if i % 5 == 0 else [],
+            "created_at": now - timedelta(days=i),
+            "updated_at": now - timedelta(hours=i),
+            "version": 1 + i % 7,
+        }
+        for i in range(count)
+    ]
+
+
+ITEM_LIST_FIELD = create_response_field(name="Response_get_items", type_=List[server.Item])
+
+loop = asyncio.new_event_loop()
+
+
+def response_model_path(docs: list) -> bytes:
+    # The route before: a model per document, re-validated by FastAPI against response_model
+    items = [server.Item(**server.parse_item_timestamps(doc)) for doc in docs]
+    content = loop.run_until_complete(serialize_response(field=ITEM_LIST_FIELD, response_content=items))
+    return JSONResponse(content).body
+
+
+def endpoint_path(fast_json: bool):
+    settings = replace(server.settings, fast_json=fast_json)
+
+    def render(docs: list) -> bytes:
+        # What list_items does with the documents it read
+        server.settings = settings
+        return server.json_response([server.item_out(doc) for doc in docs]).body
+    return render
+
+
+default_path = endpoint_path(fast_json=False)
+fast_path = endpoint_path(fast_json=True)
+
+
+def best_of(fn, docs: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # All paths must produce the same JSON values
+    sample = make_docs(50)
+    expected = json.loads(response_model_path(sample))
+    assert json.loads(default_path(sample)) == expected, "FAST_JSON=0 output differs"
+    assert json.loads(fast_path(sample)) == expected, "FAST_JSON=1 output differs"
+
+    print(
+        f"{'items':>8} {'before ms':>10} {'default ms':>11} {'fast ms':>9} "
+        f"{'before us/item':>15} {'default us/item':>16} {'fast us/item':>13} {'default':>8} {'fast':>7}"
+    )
+    for size in args.sizes:
+        docs = make_docs(size)
+        before = best_of(response_model_path, docs, args.repeat)
+        default = best_of(default_path, docs, args.repeat)
+        fast = best_of(fast_path, docs, args.repeat)
+        print(
+            f"{size:>8} {before * 1000:>10.1f} {default * 1000:>11.1f} {fast * 1000:>9.1f} "
+            f"{before / size * 1e6:>15.2f} {default / size * 1e6:>16.2f} {fast / size * 1e6:>13.2f} "
+            f"{before / default:>7.1f}x {before / fast:>6.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
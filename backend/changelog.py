@@ -0,0 +1,219 @@
+from datetime import timedelta
+from typing import Iterable, Iterator, Tuple
+import asyncio
+import logging
+import uuid
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from timestamps import as_datetime, utcnow
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# A seq whose writer died before releasing it stops holding back the feed after this long
+PENDING_TIMEOUT = timedelta(seconds=60)
+
+# Released seqs are folded into ``committed`` once this many have piled up
+COMPACT_RELEASED_AT = 32
+
+# Each user's item_versions document tracks the seqs handed out to writers:
+#   version    the last seq handed out
+#   committed  every seq up to here is released
+#   released   released seqs above ``committed``
+#   pending    one {token, at} entry per unreleased seq, in seq order
+#   horizon    cursors older than this must resync (compacted tombstones, gaps)
+# Seqs are only ever handed out and released in single updates, so the
+# unreleased seqs and the pending entries always line up one to one.
+
+
+async def next_version(db, user_id: str, session=None) -> Tuple[int, str]:
+    """Bump the user's item collection version.
+
+    Returns the new seq and the token that releases it. The version orders
+    the change log and backs the item list ETag. The seq stays pending
+    until ``release_version``; the change feed never serves past the oldest
+    pending seq, so a writer that records its changes after a later one has
+    cannot be skipped.
+    """
+    token = uuid.uuid4().hex
+    now = utcnow()
+    while True:
+        try:
+            version_doc = await db.item_versions.find_one_and_update(
+                {"user_id": user_id},
+                {
+                    "$inc": {"version": 1},
+                    "$set": {"updated_at": now},
+                    "$push": {"pending": {"token": token, "at": now}}
+                },
+                projection={"_id": 0, "version": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+        except DuplicateKeyError:
+            # Another writer created the document first
+            continue
+        return version_doc["version"], token
+
+
+async def release_version(db, user_id: str, seq: int, token: str, gap: bool = False, session=None) -> int:
+    """Mark ``seq`` as done and return the version the feed may serve up to.
+
+    With ``gap`` its changes were never recorded; cursors from before it
+    are expired so those clients resync instead of missing them.
+    """
+    update = {"$pull": {"pending": {"token": token}}, "$addToSet": {"released": seq}}
+    if gap:
+        update["$max"] = {"horizon": seq}
+    version_doc = await db.item_versions.find_one_and_update(
+        {"user_id": user_id},
+        update,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    ) or {}
+    if len(version_doc.get("released", [])) >= COMPACT_RELEASED_AT:
+        await _compact_released(db, user_id, version_doc, session=session)
+    return feed_window(version_doc)[1]
+
+
+def _unreleased(version_doc: dict) -> Iterator[Tuple[int, dict]]:
+    # Pairs each unreleased seq with its pending entry
+    released = set(version_doc.get("released", []))
+    unreleased = (
+        seq for seq in range(version_doc.get("committed", 0) + 1, version_doc.get("version", 0) + 1)
+        if seq not in released
+    )
+    return zip(unreleased, version_doc.get("pending", []))
+
+
+def feed_window(version_doc: dict) -> Tuple[int, int]:
+    """Oldest cursor the change feed can serve and the seq it may serve up to.
+
+    Every change up to the second value is in the log, except for seqs
+    abandoned by a writer that died; those raise the first value instead.
+    """
+    horizon = version_doc.get("horizon", 0)
+    cutoff = utcnow() - PENDING_TIMEOUT
+    for seq, entry in _unreleased(version_doc):
+        if as_datetime(entry["at"]) > cutoff:
+            return horizon, seq - 1
+        horizon = max(horizon, seq)
+    return horizon, version_doc.get("version", 0)
+
+
+async def _compact_released(db, user_id: str, version_doc: dict, session=None):
+    committed = version_doc.get("committed", 0)
+    released = set(version_doc.get("released", []))
+    contiguous = committed
+    while contiguous + 1 in released:
+        contiguous += 1
+    if contiguous > committed:
+        # Safe against concurrent writers: every seq up to ``contiguous`` is already released
+        await db.item_versions.update_one(
+            {"user_id": user_id},
+            {"$max": {"committed": contiguous}, "$pull": {"released": {"$lte": contiguous}}},
+            session=session
+        )
+
+
+async def record_changes(db, user_id: str, seq: int, upserted: Iterable[str] = (), deleted: Iterable[str] = (), session=None):
+    """Record the latest change per item; deletions leave a tombstone.
+
+    The log holds one entry per (user, item), so it never grows past the
+    inventory plus unexpired tombstones. An entry is only replaced by a
+    newer seq: when two writes to one item race, the later one wins.
+    """
+    now = utcnow()
+    writes = [
+        UpdateOne(
+            {"user_id": user_id, "item_id": item_id, "seq": {"$lt": seq}},
+            {"$set": {"seq": seq, "deleted": is_deleted, "changed_at": now}},
+            upsert=True
+        )
+        for items, is_deleted in ((upserted, False), (deleted, True))
+        for item_id in items
+    ]
+    if not writes:
+        return
+
+    try:
+        await db.item_changes.bulk_write(writes, ordered=False, session=session)
+    except BulkWriteError as e:
+        # A duplicate key means the entry already has a newer seq
+        errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+        if errors:
+            raise
+
+
+def changes_after(user_id: str, seq: int, last_id: str, upto: int) -> dict:
+    # An empty last_id means everything up to and including seq has been seen;
+    # nothing past the committed version ``upto`` is served yet
+    if not last_id:
+        return {"user_id": user_id, "seq": {"$gt": seq, "$lte": upto}}
+    return {"user_id": user_id, "seq": {"$lte": upto}, "$or": [
+        {"seq": {"$gt": seq}},
+        {"seq": seq, "item_id": {"$gt": last_id}},
+    ]}
+
+
+async def compact_tombstones(db, retention: timedelta) -> int:
+    """Drop tombstones older than ``retention``.
+
+    Each affected user's horizon is raised to the newest dropped seq first;
+    cursors older than the horizon can no longer be served and must resync.
+    """
+    cutoff = utcnow() - retention
+    horizons = await db.item_changes.aggregate([
+        {"$match": {"deleted": True, "changed_at": {"$lt": cutoff}}},
+        {"$group": {"_id": "$user_id", "seq": {"$max": "$seq"}}}
+    ]).to_list(None)
+    if not horizons:
+        return 0
+
+    await db.item_versions.bulk_write([
+        UpdateOne({"user_id": h["_id"]}, {"$max": {"horizon": h["seq"]}}, upsert=True)
+        for h in horizons
+    ], ordered=False)
+    result = await db.item_changes.delete_many({"deleted": True, "changed_at": {"$lt": cutoff}})
+    return result.deleted_count
+
+
+async def prune_pending(db):
+    # Release seqs abandoned by writers that died; feed_window already treats them as gaps
+    cutoff = utcnow() - PENDING_TIMEOUT
+    async for version_doc in db.item_versions.find({"pending.at": {"$lt": cutoff}}, {"_id": 0}):
+        stale = [(seq, entry["token"]) for seq, entry in _unreleased(version_doc) if as_datetime(entry["at"]) <= cutoff]
+        if not stale:
+            continue
+        seqs, tokens = [seq for seq, _ in stale], [token for _, token in stale]
+        # Skipped if one of them was released meanwhile; the next run looks again
+        result = await db.item_versions.update_one(
+            {"user_id": version_doc["user_id"], "pending.token": {"$all": tokens}},
+            {
+                "$pull": {"pending": {"token": {"$in": tokens}}},
+                "$addToSet": {"released": {"$each": seqs}},
+                "$max": {"horizon": max(seqs)}
+            }
+        )
+        if result.modified_count:
+            released = set(version_doc.get("released", [])) | set(seqs)
+            await _compact_released(db, version_doc["user_id"], {**version_doc, "released": list(released)})
+
+
+async def run_tombstone_compactor(db, interval: float, retention: timedelta):
+    while True:
+        try:
+            await prune_pending(db)
+            compacted = await compact_tombstones(db, retention)
+            if compacted:
+                logger.info(f"Compacted {compacted} item tombstones")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Tombstone compaction failed: {e}")
+        await asyncio.sleep(interval)
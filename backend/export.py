@@ -0,0 +1,201 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+import csv
+import io
+import json
+import zlib
+
+EXPORT_COLUMNS = [
+    "item_id", "navn", "kategori", "serienummer", "verdi", "valuta",
+    "notat", "vedlegg_urls", "created_at", "updated_at",
+]
+
+# Rows per chunk handed to the ASGI server
+CHUNK_ROWS = 200
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return " ".join(value)
+    return str(value)
+
+
+async def csv_chunks(docs: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel picks up UTF-8 (æ, ø, å)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+
+    rows = 0
+    async for doc in docs:
+        writer.writerow([_cell(doc.get(column)) for column in EXPORT_COLUMNS])
+        rows += 1
+        if rows % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode()
+
+
+async def jsonl_chunks(docs: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    lines = []
+    async for doc in docs:
+        row = {column: doc.get(column) for column in EXPORT_COLUMNS}
+        lines.append(json.dumps(row, ensure_ascii=False, default=_cell))
+        if len(lines) == CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+class PdfStreamWriter:
+    """Minimal PDF writer that emits one page at a time.
+
+    Only object offsets and page object numbers are kept in memory. The page
+    tree (object 2) is written last, once all pages are known; PDF allows
+    objects in any order as long as the xref table points at them.
+    """
+
+    WIDTH = 595
+    HEIGHT = 842
+    MARGIN = 40
+    FONT_SIZE = 9
+    LEADING = 12
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = 4  # 1 catalog, 2 page tree, 3 font
+
+    @property
+    def lines_per_page(self) -> int:
+        return (self.HEIGHT - 2 * self.MARGIN) // self.LEADING
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def _object(self, obj_id: int, body: bytes) -> bytes:
+        self.offsets[obj_id] = self.offset
+        return self._emit(f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    @staticmethod
+    def _text(value: str) -> bytes:
+        encoded = value.encode("cp1252", errors="replace")
+        return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    def start(self) -> bytes:
+        out = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        out += self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        out += self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        return out
+
+    def page(self, lines: List[List[tuple]]) -> bytes:
+        """``lines`` holds, per text line, a list of (x, text) cells."""
+        content = [f"BT /F1 {self.FONT_SIZE} Tf".encode()]
+        y = self.HEIGHT - self.MARGIN
+        for cells in lines:
+            for x, text in cells:
+                content.append(f"1 0 0 1 {x} {y} Tm (".encode() + self._text(text) + b") Tj")
+            y -= self.LEADING
+        content.append(b"ET")
+        stream = b"\n".join(content)
+
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.page_ids.append(page_id)
+
+        out = self._object(content_id, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        out += self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.WIDTH} {self.HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        return out
+
+    def finish(self) -> bytes:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        out = self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+
+        xref_offset = self.offset
+        size = self.next_id
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            xref.append(f"{self.offsets[obj_id]:010d} 00000 n \n")
+        out += self._emit("".join(xref).encode())
+        out += self._emit(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        return out
+
+
+# (x position, column, max characters) for the PDF table
+PDF_COLUMNS = [
+    (40, "navn", 38),
+    (240, "kategori", 16),
+    (330, "serienummer", 22),
+    (450, "verdi", 18),
+]
+PDF_HEADINGS = {"navn": "Navn", "kategori": "Kategori", "serienummer": "Serienummer", "verdi": "Verdi"}
+
+
+def _pdf_row(doc: dict) -> List[tuple]:
+    cells = []
+    for x, column, width in PDF_COLUMNS:
+        value = doc.get(column)
+        if column == "verdi" and value is not None:
+            text = f"{value:,.2f} {doc.get('valuta') or ''}".replace(",", " ")
+        else:
+            text = _cell(value)
+        if len(text) > width:
+            text = text[:width - 1] + "…"
+        cells.append((x, text))
+    return cells
+
+
+async def pdf_chunks(docs: AsyncIterator[dict], title: str) -> AsyncIterator[bytes]:
+    pdf = PdfStreamWriter()
+    yield pdf.start()
+
+    heading = [(x, PDF_HEADINGS[column]) for x, column, _ in PDF_COLUMNS]
+    lines = [[(40, title)], [], heading]
+    totals: Dict[str, float] = {}
+    count = 0
+
+    async for doc in docs:
+        count += 1
+        if doc.get("verdi") is not None:
+            valuta = doc.get("valuta") or "NOK"
+            totals[valuta] = totals.get(valuta, 0) + doc["verdi"]
+
+        lines.append(_pdf_row(doc))
+        if len(lines) >= pdf.lines_per_page:
+            yield pdf.page(lines)
+            lines = [heading]
+
+    lines.append([])
+    lines.append([(40, f"Antall gjenstander: {count}")])
+    for valuta, total in sorted(totals.items()):
+        lines.append([(40, f"Total verdi: {total:,.2f} {valuta}".replace(",", " "))])
+
+    # The summary may spill over onto one more page
+    while lines:
+        yield pdf.page(lines[:pdf.lines_per_page])
+        lines = lines[pdf.lines_per_page:]
+
+    yield pdf.finish()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,118 @@
+from typing import Optional
+import asyncio
+import random
+import time
+
+import httpx
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets a single
+    trial call through once ``reset_timeout`` seconds have passed."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # Times it has opened from closed
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open":
+            raise CircuitOpen("Upstream circuit is open")
+        if state == "half-open":
+            # Only one trial call; the rest keep failing fast until it reports back
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """App-lifetime HTTP client with keep-alive pooling, retries and a circuit breaker.
+
+    Call ``start()`` on startup and ``close()`` on shutdown. Connection errors
+    and 5xx responses are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.breaker = breaker or CircuitBreaker()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=self.limits,
+                transport=self._transport,
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if self._client is None:
+            await self.start()
+
+        self.breaker.before_call()
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    return response
+
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
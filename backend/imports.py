@@ -0,0 +1,250 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import io
+import logging
+import re
+import uuid
+
+from pymongo.errors import BulkWriteError
+
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 500
+
+# Column headings we recognise, lower-cased, mapped to item fields
+HEADER_ALIASES = {
+    "navn": "navn", "name": "navn", "gjenstand": "navn", "beskrivelse": "navn",
+    "description": "navn", "produkt": "navn", "item": "navn",
+    "kategori": "kategori", "category": "kategori", "type": "kategori",
+    "serienummer": "serienummer", "serienr": "serienummer", "serial": "serienummer",
+    "serial number": "serienummer", "s/n": "serienummer", "sn": "serienummer",
+    "verdi": "verdi", "value": "verdi", "pris": "verdi", "price": "verdi",
+    "beløp": "verdi", "sum": "verdi", "forsikringssum": "verdi",
+    "valuta": "valuta", "currency": "valuta",
+    "notat": "notat", "note": "notat", "notes": "notat", "kommentar": "notat", "merknad": "notat",
+}
+
+_CELL_SPLIT = re.compile(r"\t|;|\||\s{2,}")
+_AMOUNT = re.compile(r"^(?:kr\.?|nok|eur|usd|sek|dkk)?\s*(-?[\d\s.,]+?)(?:,-)?\s*(?:kr|nok|eur|usd|sek|dkk)?$", re.IGNORECASE)
+_CURRENCY = re.compile(r"\b(NOK|EUR|USD|SEK|DKK)\b", re.IGNORECASE)
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """Parse Norwegian and English number formats: "12 345,50", "kr 1.234,-", "1,234.50"."""
+    match = _AMOUNT.match(text.strip())
+    if not match:
+        return None
+    number = match.group(1).replace(" ", "").replace(" ", "")
+    if not number or not any(ch.isdigit() for ch in number):
+        return None
+
+    if "," in number and "." in number:
+        # Whichever separator comes last is the decimal separator
+        if number.rfind(",") > number.rfind("."):
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif "," in number:
+        whole, _, frac = number.rpartition(",")
+        number = f"{whole.replace(',', '')}.{frac}" if len(frac) != 3 else number.replace(",", "")
+    elif number.count(".") > 1 or re.search(r"\.\d{3}$", number):
+        number = number.replace(".", "")
+
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def split_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in _CELL_SPLIT.split(line.strip()) if cell.strip()]
+
+
+def detect_header(cells: List[str]) -> Optional[List[Optional[str]]]:
+    columns = [HEADER_ALIASES.get(cell.lower().rstrip(":")) for cell in cells]
+    if "navn" in columns and sum(1 for c in columns if c) >= 2:
+        return columns
+    return None
+
+
+def map_rows(lines: List[str]) -> List[dict]:
+    """Turn text lines into item rows.
+
+    Lines after a recognised header row are mapped column by column. Without
+    a header, a line whose last cell is an amount becomes ``navn`` + ``verdi``.
+    """
+    rows = []
+    columns = None
+
+    for line in lines:
+        cells = split_cells(line)
+        if not cells:
+            continue
+
+        header = detect_header(cells)
+        if header:
+            columns = header
+            continue
+
+        row = {}
+        if columns and len(cells) >= 2:
+            for column, cell in zip(columns, cells):
+                if column == "verdi":
+                    row["verdi"] = parse_amount(cell)
+                    currency = _CURRENCY.search(cell)
+                    if currency:
+                        row.setdefault("valuta", currency.group(1).upper())
+                elif column:
+                    row[column] = cell
+        elif len(cells) >= 2:
+            amount = parse_amount(cells[-1])
+            if amount is None:
+                continue
+            row = {"navn": " ".join(cells[:-1]), "verdi": amount}
+            currency = _CURRENCY.search(cells[-1])
+            if currency:
+                row["valuta"] = currency.group(1).upper()
+
+        if row.get("navn"):
+            rows.append(row)
+
+    return rows
+
+
+def extract_rows(pdf_bytes: bytes) -> dict:
+    """Text extraction, table detection and row mapping. Runs in a worker process."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    lines = []
+    for page in reader.pages:
+        # Layout mode keeps column gaps, which is what table detection relies on
+        text = page.extract_text(extraction_mode="layout") or ""
+        lines.extend(text.splitlines())
+
+    return {"pages": len(reader.pages), "rows": map_rows(lines)}
+
+
+class ImportQueueFull(Exception):
+    pass
+
+
+class ImportQueue:
+    """Bounded queue of PDF import jobs.
+
+    Job state lives in ``db.import_jobs``; the uploaded bytes only live in
+    the in-memory queue, so jobs interrupted by a restart are marked failed
+    on startup. Parsing runs in a process pool and never on the event loop.
+    """
+
+    def __init__(
+        self,
+        db,
+        make_item: Callable[[dict, str], Optional[dict]],
+        on_items_changed: Callable[[str, List[str]], Awaitable[int]],
+        workers: int = 2,
+        max_queued: int = 20,
+    ):
+        self.db = db
+        self.make_item = make_item
+        self.on_items_changed = on_items_changed
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        await self.db.import_jobs.update_many(
+            {"status": {"$in": ["queued", "processing"]}},
+            {"$set": {"status": "failed", "error": "Interrupted by server restart", "updated_at": utcnow()}}
+        )
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, user_id: str, filename: str, pdf_bytes: bytes) -> dict:
+        if self.queue.full():
+            raise ImportQueueFull()
+
+        now = utcnow()
+        job = {
+            "job_id": f"import_{uuid.uuid4().hex[:12]}",
+            "user_id": user_id,
+            "filename": filename,
+            "status": "queued",
+            "progress": {"stage": "queued", "pages": None, "items_found": 0, "items_imported": 0, "percent": 0},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.db.import_jobs.insert_one(job)
+        job.pop("_id", None)
+        try:
+            self.queue.put_nowait((job["job_id"], user_id, pdf_bytes))
+        except asyncio.QueueFull:
+            # Another upload took the last slot while the job was being recorded
+            await self._update(job["job_id"], status="failed", error="Import queue is full")
+            raise ImportQueueFull()
+        return job
+
+    async def _update(self, job_id: str, **fields):
+        await self.db.import_jobs.update_one(
+            {"job_id": job_id},
+            {"$set": {**fields, "updated_at": utcnow()}}
+        )
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, user_id, pdf_bytes = await self.queue.get()
+            try:
+                await self._update(job_id, status="processing", **{"progress.stage": "extracting", "progress.percent": 5})
+                parsed = await loop.run_in_executor(self._executor, extract_rows, pdf_bytes)
+                del pdf_bytes
+
+                docs = [doc for doc in (self.make_item(row, user_id) for row in parsed["rows"]) if doc]
+                await self._update(job_id, **{
+                    "progress.stage": "saving",
+                    "progress.pages": parsed["pages"],
+                    "progress.items_found": len(docs),
+                    "progress.percent": 50,
+                })
+
+                imported: List[str] = []
+                try:
+                    for start in range(0, len(docs), INSERT_BATCH_SIZE):
+                        batch = docs[start:start + INSERT_BATCH_SIZE]
+                        try:
+                            await self.db.items.insert_many(batch, ordered=False)
+                        except BulkWriteError as e:
+                            # Unordered: every document without a write error went in
+                            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                            imported.extend(doc["item_id"] for index, doc in enumerate(batch) if index not in failed)
+                            raise
+                        imported.extend(doc["item_id"] for doc in batch)
+                        await self._update(job_id, **{
+                            "progress.items_imported": len(imported),
+                            "progress.percent": 50 + int(50 * len(imported) / len(docs)),
+                        })
+                finally:
+                    # Whatever was inserted must reach the list version and change log,
+                    # even when a later batch fails
+                    if imported:
+                        await self.on_items_changed(user_id, imported)
+
+                await self._update(job_id, status="done", **{"progress.stage": "done", "progress.percent": 100})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Import {job_id} failed: {e}")
+                await self._update(job_id, status="failed", error="Import failed", **{"progress.stage": "failed"})
+            finally:
+                self.queue.task_done()
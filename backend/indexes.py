@@ -0,0 +1,157 @@
+"""MongoDB index definitions.
+
+``ensure_indexes`` runs on startup and is safe to call repeatedly. Run this
+module directly to create the indexes and print the query plan for every
+hot query:
+
+    python indexes.py            # ensure indexes, then explain
+    python indexes.py --explain  # explain only
+
+The exit status is 1 if any hot query falls back to a collection scan.
+"""
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], name="session_token_unique", unique=True),
+        # Mongo deletes date-typed sessions once expired; string-dated ones are left to the reaper
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "items": [
+        IndexModel([("item_id", ASCENDING)], name="item_id_unique", unique=True),
+        # One per GET /api/items sort order; item_id is the keyset tie-breaker
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("item_id", DESCENDING)], name="user_updated_at"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("item_id", DESCENDING)], name="user_created_at"),
+        IndexModel([("user_id", ASCENDING), ("navn", ASCENDING), ("item_id", ASCENDING)], name="user_navn"),
+        IndexModel([("user_id", ASCENDING), ("verdi", ASCENDING), ("item_id", ASCENDING)], name="user_verdi"),
+        # GET /api/items/search: per-user full text, plus serial-number prefix lookups
+        IndexModel(
+            [("user_id", ASCENDING), ("navn", TEXT), ("kategori", TEXT), ("serienummer", TEXT), ("notat", TEXT)],
+            name="user_text",
+            weights={"navn": 10, "serienummer": 8, "kategori": 5, "notat": 1},
+            default_language="norwegian",
+            language_override="_language"
+        ),
+        IndexModel([("user_id", ASCENDING), ("serienummer_key", ASCENDING)], name="user_serial_key"),
+    ],
+    # Per-user collection version behind the item list ETag
+    "item_versions": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    # GET /api/items/changes: one entry per item, read in (seq, item_id) order
+    "item_changes": [
+        IndexModel([("user_id", ASCENDING), ("item_id", ASCENDING)], name="user_item_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("seq", ASCENDING), ("item_id", ASCENDING)], name="user_seq"),
+        IndexModel(
+            [("changed_at", ASCENDING)],
+            name="tombstone_changed_at",
+            partialFilterExpression={"deleted": True}
+        ),
+    ],
+    "payment_transactions": [
+        IndexModel([("session_id", ASCENDING), ("user_id", ASCENDING)], name="session_user"),
+        IndexModel([("user_id", ASCENDING), ("package_id", ASCENDING), ("payment_status", ASCENDING)], name="user_package"),
+    ],
+    "stripe_events": [
+        IndexModel([("event_key", ASCENDING)], name="event_key_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+    ],
+    "import_jobs": [
+        IndexModel([("job_id", ASCENDING)], name="job_id_unique", unique=True),
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+}
+
+# (name, collection, filter, sort) for every query the API issues per request.
+# Values are placeholders; the plan does not depend on them.
+HOT_QUERIES = [
+    ("users by email", "users", {"email": "user@example.com"}, None),
+    ("users by user_id", "users", {"user_id": "user_x"}, None),
+    ("session by token", "user_sessions", {"session_token": "session_x"}, None),
+    ("item by id and owner", "items", {"item_id": "item_x", "user_id": "user_x"}, None),
+    ("items by owner", "items", {"user_id": "user_x"}, [("updated_at", DESCENDING), ("item_id", DESCENDING)]),
+    ("items by owner, by name", "items", {"user_id": "user_x"}, [("navn", ASCENDING), ("item_id", ASCENDING)]),
+    ("items by serial prefix", "items", {"user_id": "user_x", "serienummer_key": {"$regex": "^SN12"}}, [("serienummer_key", ASCENDING)]),
+    ("item version by owner", "item_versions", {"user_id": "user_x"}, None),
+    ("item changes since seq", "item_changes", {"user_id": "user_x", "seq": {"$gt": 0}}, [("seq", ASCENDING), ("item_id", ASCENDING)]),
+    ("transaction by session and owner", "payment_transactions", {"session_id": "cs_x", "user_id": "user_x"}, None),
+]
+
+
+async def ensure_indexes(db):
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # Duplicate data or a conflicting definition: keep serving, but say so loudly
+                logger.error(f"Could not create index {collection}.{model.document['name']}: {e}")
+
+
+def _plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def explain_hot_queries(db) -> list:
+    report = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        winning = explained["queryPlanner"]["winningPlan"]
+        # Newer servers nest the classic plan under queryPlan
+        stages = [s for s in _plan_stages(winning.get("queryPlan", winning)) if s]
+        report.append({
+            "name": name,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+async def _main(argv):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+    from pathlib import Path
+    import os
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        if "--explain" not in argv:
+            await ensure_indexes(db)
+        report = await explain_hot_queries(db)
+    finally:
+        client.close()
+
+    for entry in report:
+        flag = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"{flag:8} {entry['collection']:22} {entry['name']:34} {' <- '.join(entry['stages'])}")
+
+    return 1 if any(entry["collscan"] for entry in report) else 0
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
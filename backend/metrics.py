@@ -0,0 +1,331 @@
+"""Request and MongoDB metrics in the Prometheus text format.
+
+``TimingMiddleware`` times every HTTP request under its route template and
+counts responses by status. ``CommandTimer`` is a pymongo command listener;
+each command is timed and attributed to the request that issued it through
+a context variable, which Motor carries into its worker threads.
+``PoolMonitor`` follows the driver's connection pool of each server, so
+saturation (every connection checked out, requests queueing for one) is
+visible per replica set member. Runtime stats of the caches and pools are
+exported via ``register_stats``: running totals as counters, the rest as
+gauges.
+"""
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import bisect
+import threading
+import time
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum, count
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class RequestStats:
+    """Mongo work done on behalf of one HTTP request."""
+
+    __slots__ = ("db_ops", "db_seconds")
+
+    def __init__(self):
+        self.db_ops = 0
+        self.db_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+http_requests = Counter("http_requests_total", "HTTP responses by route template and status.")
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template.")
+request_db_ops = Histogram("http_request_mongo_commands", "MongoDB commands issued per HTTP request.", COUNT_BUCKETS)
+request_db_time = Histogram("http_request_mongo_seconds", "Time spent in MongoDB per HTTP request.")
+mongo_duration = Histogram("mongo_command_duration_seconds", "MongoDB command round-trip time by command.")
+mongo_failures = Counter("mongo_command_failures_total", "Failed MongoDB commands by command.")
+mongo_checkout_wait = Histogram("mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection by server.")
+mongo_checkout_failures = Counter("mongo_pool_checkout_failures_total", "Failed connection checkouts by server and reason.")
+
+_stats_sources: Dict[str, Tuple[Callable[[], dict], FrozenSet[str]]] = {}
+_collectors: List = []
+
+
+def register_stats(name: str, source: Callable[[], dict], counters: Iterable[str] = ()):
+    """Export the numeric values of ``source()`` as ``<name>_<key>``.
+
+    Values are gauges, except the keys in ``counters`` (nested keys joined
+    with ``_``): running totals that only reset with the process, exported
+    as ``<name>_<key>_total`` counters so ``rate()`` handles restarts.
+    """
+    _stats_sources[name] = (source, frozenset(f"{name}_{key}" for key in counters))
+
+
+def register_collector(collector):
+    """Export a collector with its own ``render()``, for metrics that need labels."""
+    _collectors.append(collector)
+
+
+def _flatten(prefix: str, stats: dict, out: Dict[str, float]):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            _flatten(name, value, out)
+        elif isinstance(value, bool):
+            out[name] = float(value)
+        elif isinstance(value, (int, float)):
+            out[name] = value
+        elif isinstance(value, datetime):
+            out[name] = value.timestamp()
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in (
+        http_requests, http_duration, request_db_ops, request_db_time,
+        mongo_duration, mongo_failures, mongo_checkout_wait, mongo_checkout_failures
+    ):
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector.render())
+
+    values: Dict[str, float] = {}
+    counters = set()
+    for name, (source, source_counters) in _stats_sources.items():
+        _flatten(name, source(), values)
+        counters |= source_counters
+    for name, value in sorted(values.items()):
+        if name in counters:
+            lines.append(f"# TYPE {name}_total counter")
+            lines.append(f"{name}_total {value}")
+        else:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Times MongoDB commands and charges them to the current request."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        mongo_failures.inc(command=event.command_name)
+        self._record(event)
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, command=event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_ops += 1
+            stats.db_seconds += seconds
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks connection pool usage per server.
+
+    Each replica set member has its own pool of up to ``max_size``
+    connections, so saturation is per server: ``checked_out`` reaching
+    ``max_size`` means that member's pool is exhausted and ``waiting`` is the
+    number of operations queued for one of its connections.
+    """
+
+    FIELDS = ("open", "checked_out", "waiting", "cleared")
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._servers: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        # A checkout starts and ends on the thread doing it
+        self._wait_started: Dict[Tuple[str, int], float] = {}
+
+    @staticmethod
+    def _label(address) -> str:
+        host, port = address
+        return f"{host}:{port}"
+
+    def _add(self, address, field: str, amount: int):
+        with self._lock:
+            server = self._servers.get(self._label(address))
+            # Late events from a closed pool are ignored
+            if server is not None:
+                server[field] += amount
+
+    def pool_created(self, event):
+        with self._lock:
+            self._servers.setdefault(self._label(event.address), dict.fromkeys(self.FIELDS, 0))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(event.address, "cleared", 1)
+
+    def pool_closed(self, event):
+        # The member left the topology; drop its series
+        with self._lock:
+            self._servers.pop(self._label(event.address), None)
+
+    def connection_created(self, event):
+        self._add(event.address, "open", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(event.address, "open", -1)
+
+    def connection_check_out_started(self, event):
+        self._add(event.address, "waiting", 1)
+        with self._lock:
+            self._wait_started[(self._label(event.address), threading.get_ident())] = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        mongo_checkout_failures.inc(reason=str(event.reason), server=self._label(event.address))
+        self._checkout_ended(event.address)
+
+    def connection_checked_out(self, event):
+        self._checkout_ended(event.address)
+        self._add(event.address, "checked_out", 1)
+
+    def connection_checked_in(self, event):
+        self._add(event.address, "checked_out", -1)
+
+    def _checkout_ended(self, address):
+        self._add(address, "waiting", -1)
+        with self._lock:
+            started = self._wait_started.pop((self._label(address), threading.get_ident()), None)
+        if started is not None:
+            mongo_checkout_wait.observe(time.perf_counter() - started, server=self._label(address))
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                label: {**server, "saturated": server["checked_out"] >= self.max_size}
+                for label, server in self._servers.items()
+            }
+
+    def render(self) -> List[str]:
+        servers = self.stats()
+        lines = ["# TYPE mongo_pool_max_size gauge", f"mongo_pool_max_size {self.max_size}"]
+        for field in self.FIELDS + ("saturated",):
+            # Clears only ever add up; the rest are current levels
+            name, kind = ("mongo_pool_cleared_total", "counter") if field == "cleared" else (f"mongo_pool_{field}", "gauge")
+            lines.append(f"# TYPE {name} {kind}")
+            for label, server in sorted(servers.items()):
+                lines.append(f"{name}{_format_labels((('server', label),))} {int(server[field])}")
+        return lines
+
+
+class TimingMiddleware:
+    """Records latency, status and Mongo usage for every HTTP request.
+
+    Also adds a ``Server-Timing`` header with the request's Mongo time and
+    command count, so clients and load tests can see it per response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_ops} commands"'.encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            # The route template keeps label cardinality bounded; unmatched paths share one label
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method=method, route=path, status=str(status))
+            http_duration.observe(elapsed, method=method, route=path)
+            request_db_ops.observe(stats.db_ops, method=method, route=path)
+            request_db_time.observe(stats.db_seconds, method=method, route=path)
@@ -0,0 +1,139 @@
+"""One-off data migrations.
+
+Each migration walks its collections in ``_id`` order in batches and records
+the last processed ``_id`` in ``db.migrations`` after every batch, so an
+interrupted run resumes where it stopped. Re-running a finished migration is
+a no-op.
+
+    python migrations.py                 # run all migrations
+    python migrations.py datetimes       # run one
+    python migrations.py datetimes --restart
+"""
+from pymongo import UpdateOne
+import logging
+
+from search import serial_key
+from timestamps import as_datetime, utcnow
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# Timestamp fields that used to be stored as ISO strings
+DATETIME_FIELDS = {
+    "users": ["created_at", "subscription_started_at"],
+    "user_sessions": ["created_at", "expires_at"],
+    "items": ["created_at", "updated_at"],
+    "payment_transactions": ["created_at", "completed_at"],
+}
+
+
+async def _checkpoint(db, key: str):
+    doc = await db.migrations.find_one({"_id": key})
+    return doc or {"_id": key, "last_id": None, "done": False}
+
+
+async def _save_checkpoint(db, key: str, last_id, done: bool = False):
+    await db.migrations.update_one(
+        {"_id": key},
+        {"$set": {"last_id": last_id, "done": done, "updated_at": utcnow()}},
+        upsert=True
+    )
+
+
+async def run_batched(db, key: str, collection: str, query: dict, convert, batch_size: int = BATCH_SIZE) -> int:
+    """Apply ``convert(doc) -> $set dict`` to every document matching ``query``.
+
+    Returns the number of documents updated in this run.
+    """
+    state = await _checkpoint(db, key)
+    if state["done"]:
+        return 0
+
+    last_id = state["last_id"]
+    updated = 0
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+
+        docs = await db[collection].find(batch_query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            changes = convert(doc)
+            if changes:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if ops:
+            result = await db[collection].bulk_write(ops, ordered=False)
+            updated += result.modified_count
+
+        last_id = docs[-1]["_id"]
+        await _save_checkpoint(db, key, last_id)
+        logger.info(f"{key}: {updated} documents updated so far")
+
+    await _save_checkpoint(db, key, last_id, done=True)
+    return updated
+
+
+async def migrate_datetimes(db, batch_size: int = BATCH_SIZE) -> int:
+    total = 0
+    for collection, fields in DATETIME_FIELDS.items():
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+        def convert(doc, fields=fields):
+            return {
+                field: as_datetime(doc[field])
+                for field in fields
+                if isinstance(doc.get(field), str)
+            }
+
+        total += await run_batched(db, f"datetimes:{collection}", collection, query, convert, batch_size)
+    return total
+
+
+async def backfill_serial_keys(db, batch_size: int = BATCH_SIZE) -> int:
+    query = {"serienummer": {"$type": "string"}, "serienummer_key": {"$exists": False}}
+    return await run_batched(
+        db, "serial_keys:items", "items", query,
+        lambda doc: {"serienummer_key": serial_key(doc["serienummer"])},
+        batch_size
+    )
+
+
+MIGRATIONS = {
+    "datetimes": migrate_datetimes,
+    "serial_keys": backfill_serial_keys,
+}
+
+
+async def _main(argv):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+    from pathlib import Path
+    import os
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+
+    names = [arg for arg in argv if not arg.startswith("--")] or list(MIGRATIONS)
+    try:
+        for name in names:
+            if "--restart" in argv:
+                await db.migrations.delete_many({"_id": {"$regex": f"^{name}:"}})
+            updated = await MIGRATIONS[name](db)
+            print(f"{name}: {updated} documents updated")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Any, Optional, Tuple
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    # The value ends up in a query, so only what _encode_value produces is
+    # accepted; anything else could smuggle in operators like $regex
+    if value is None or isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, dict) and list(value) == ["$date"] and isinstance(value["$date"], str):
+        return datetime.fromisoformat(value["$date"])
+    raise InvalidCursor("Invalid cursor value")
+
+
+def encode_cursor(sort: str, value: Any, item_id: str) -> str:
+    payload = json.dumps({"s": sort, "v": _encode_value(value), "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort or not isinstance(payload["id"], str):
+            raise InvalidCursor("Cursor does not match sort order")
+        return _decode_value(payload["v"]), payload["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def keyset_filter(
+    field: str,
+    direction: int,
+    value: Optional[Any],
+    last_id: str,
+    id_field: str = "item_id",
+    mixed_dates: bool = False,
+) -> dict:
+    """Filter selecting documents strictly after (value, last_id) in the
+    ``[(field, direction), (id_field, direction)]`` sort order.
+
+    Nulls sort before every other value in MongoDB, so they need their own
+    branches: range operators never match them. With ``mixed_dates`` the
+    field may hold both legacy ISO strings and BSON dates; strings sort
+    before dates, so crossing from one type to the other needs a branch too.
+    """
+    after = "$gt" if direction == 1 else "$lt"
+    same_value = {field: value, id_field: {after: last_id}}
+
+    if value is None:
+        if direction == 1:
+            return {"$or": [same_value, {field: {"$ne": None}}]}
+        return same_value
+
+    branches = [{field: {after: value}}, same_value]
+    if direction == -1:
+        branches.append({field: None})
+    if mixed_dates:
+        if direction == -1 and isinstance(value, datetime):
+            branches.append({field: {"$type": "string"}})
+        elif direction == 1 and isinstance(value, str):
+            branches.append({field: {"$type": "date"}})
+    return {"$or": branches}
@@ -0,0 +1,100 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import functools
+import time
+
+
+@functools.lru_cache(maxsize=None)
+def pwd_context():
+    # passlib and bcrypt are imported on first use, in whichever process hashes
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Module-level so they can be pickled into a process pool
+def _hash(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context().verify(password, password_hash)
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class OpTimer:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "total_seconds": self.total_seconds,
+            "avg_seconds": self.total_seconds / self.count if self.count else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+class PasswordPool:
+    """Runs bcrypt hashing/verification off the event loop.
+
+    At most ``max_pending`` calls may be queued or running at once; beyond
+    that ``PoolSaturated`` is raised so callers can shed load instead of
+    piling up work behind a slow pool.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, kind: str = "thread"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self.pending = 0
+        self.rejected = 0
+        self.timers = {"hash": OpTimer(), "verify": OpTimer()}
+        self._executor = self._make_executor()
+
+    def _make_executor(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password")
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run("verify", _verify, password, password_hash)
+
+    async def _run(self, op: str, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated(f"{self.pending} password operations already pending")
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.timers[op].record(time.perf_counter() - started)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            **{op: timer.stats() for op, timer in self.timers.items()},
+        }
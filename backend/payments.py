@@ -0,0 +1,78 @@
+from typing import TYPE_CHECKING, Optional
+
+from cache import TTLCache
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutStatusResponse
+
+
+def _stripe_checkout(api_key: str, webhook_url: str) -> "StripeCheckout":
+    # The integrations package drags in several large SDKs; import it on first use
+    from emergentintegrations.payments.stripe.checkout import StripeCheckout
+    return StripeCheckout(api_key=api_key, webhook_url=webhook_url)
+
+
+class PaymentsNotConfigured(Exception):
+    pass
+
+
+class PaymentsClient:
+    """App-scoped Stripe access.
+
+    ``StripeCheckout`` instances are built once, on first use: one default
+    client for status checks and webhooks, plus one per webhook URL for
+    creating checkout sessions (the webhook URL depends on the caller's
+    origin). Checkout status lookups are cached briefly and concurrent
+    lookups for the same session share one upstream call.
+    """
+
+    def __init__(self, api_key: Optional[str], webhook_url: str, status_ttl: float = 3.0):
+        self.api_key = api_key
+        self.webhook_url = webhook_url
+        self.status_cache = TTLCache(maxsize=10000, ttl=status_ttl)
+        self.status_flights = SingleFlight()
+        self._checkouts = TTLCache(maxsize=32, ttl=24 * 60 * 60)
+        self._default: Optional["StripeCheckout"] = None
+        self.upstream_calls = 0
+
+    @property
+    def default(self) -> "StripeCheckout":
+        if not self.api_key:
+            raise PaymentsNotConfigured()
+        if self._default is None:
+            self._default = _stripe_checkout(self.api_key, self.webhook_url)
+        return self._default
+
+    def checkout_for(self, webhook_url: str) -> "StripeCheckout":
+        if not self.api_key:
+            raise PaymentsNotConfigured()
+
+        checkout = self._checkouts.get(webhook_url)
+        if checkout is None:
+            checkout = _stripe_checkout(self.api_key, webhook_url)
+            self._checkouts.set(webhook_url, checkout)
+        return checkout
+
+    async def get_checkout_status(self, session_id: str) -> "CheckoutStatusResponse":
+        cached = self.status_cache.get(session_id)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            self.upstream_calls += 1
+            checkout_status = await self.default.get_checkout_status(session_id)
+            self.status_cache.set(session_id, checkout_status)
+            return checkout_status
+
+        return await self.status_flights.do(session_id, fetch)
+
+    async def handle_webhook(self, body: bytes, signature: Optional[str]):
+        return await self.default.handle_webhook(body, signature)
+
+    def stats(self) -> dict:
+        return {
+            "upstream_status_calls": self.upstream_calls,
+            "status_cache": self.status_cache.stats(),
+            "status_flights": self.status_flights.stats(),
+        }
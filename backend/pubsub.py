@@ -0,0 +1,174 @@
+from typing import Any, Callable, Dict, Optional, Set
+import asyncio
+import logging
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, Any], None]
+
+# Pause before a dead tailable cursor is reopened
+TAIL_RETRY_SECONDS = 1.0
+
+
+class LocalBackend:
+    """Delivers messages within this process only."""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def stop(self):
+        pass
+
+    async def publish(self, channel: str, message: Any):
+        # Nothing can be subscribed before start
+        if self._deliver is not None:
+            self._deliver(channel, message)
+
+
+class MongoBackend:
+    """Fans messages out to every worker through a capped collection.
+
+    Each worker tails the collection, including its own messages, so local
+    subscribers are served the same way as remote ones. Old messages fall
+    off the end of the collection; nothing is replayed on startup.
+    """
+
+    def __init__(self, db, collection: str = "pubsub_messages", size_bytes: int = 8 * 1024 * 1024):
+        self.db = db
+        self.collection = collection
+        self.size_bytes = size_bytes
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        try:
+            await self.db.create_collection(self.collection, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+        self._task = asyncio.create_task(self._tail(deliver))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def publish(self, channel: str, message: Any):
+        await self.db[self.collection].insert_one({"channel": channel, "message": message})
+
+    async def _tail(self, deliver: Deliver):
+        collection = self.db[self.collection]
+        newest = await collection.find({}, {"_id": 1}).sort("$natural", -1).limit(1).to_list(1)
+        last_id = newest[0]["_id"] if newest else None
+
+        while True:
+            try:
+                if last_id is not None and not await collection.count_documents({"_id": last_id}, limit=1):
+                    # It rolled off the end while disconnected, so everything
+                    # left is newer; older messages may have been lost
+                    logger.warning("Pub/sub tail fell behind the capped collection")
+                    last_id = None
+
+                # Resume by position in insertion order: ObjectIds minted by
+                # different workers don't sort in the order they were inserted
+                skipping = last_id is not None
+                cursor = collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for doc in cursor:
+                    if skipping:
+                        skipping = doc["_id"] != last_id
+                        continue
+                    last_id = doc["_id"]
+                    deliver(doc["channel"], doc["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub tail failed: {e}")
+            # A tailable cursor on an empty collection dies immediately
+            await asyncio.sleep(TAIL_RETRY_SECONDS)
+
+
+class Subscription:
+    """A bounded buffer of messages for one subscriber.
+
+    A subscriber that falls ``maxsize`` messages behind is dropped: its
+    buffer is cleared and ``get`` returns None, after which it should
+    disconnect and resynchronise.
+    """
+
+    def __init__(self, maxsize: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def _offer(self, message: Any) -> bool:
+        if self.dropped:
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+            return False
+
+    async def get(self) -> Any:
+        return await self._queue.get()
+
+
+class PubSubHub:
+    """Per-channel fan-out to in-process subscribers through a backend."""
+
+    def __init__(self, backend=None, queue_size: int = 100):
+        self.backend = backend or LocalBackend()
+        self.queue_size = queue_size
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel: str, subscription: Subscription):
+        subscribers = self._channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[channel]
+
+    async def publish(self, channel: str, message: Any):
+        # Publishing is best effort: a broken backend must not fail the write that triggered it
+        self.published += 1
+        try:
+            await self.backend.publish(channel, message)
+        except Exception as e:
+            logger.error(f"Publish to {channel} failed: {e}")
+
+    def _deliver(self, channel: str, message: Any):
+        for subscription in list(self._channels.get(channel, ())):
+            if subscription._offer(message):
+                self.delivered += 1
+            elif subscription.dropped:
+                self.dropped += 1
+                self.unsubscribe(channel, subscription)
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(len(s) for s in self._channels.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+import orjson
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson rendering that matches the default encoder's output.
+
+    Aware datetimes get a "Z" suffix as Pydantic writes them; anything orjson
+    can't serialize natively goes through ``jsonable_encoder``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=jsonable_encoder,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
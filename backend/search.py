@@ -0,0 +1,27 @@
+from typing import Optional
+import re
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]")
+
+
+def serial_key(serienummer: Optional[str]) -> Optional[str]:
+    """Normalized form of a serial number used for prefix lookups.
+
+    Upper-cased with spaces, dashes and other separators removed, so
+    "sn 12-ab" and "SN12AB" match the same items.
+    """
+    if not serienummer:
+        return None
+    return _NON_ALNUM.sub("", serienummer.upper()) or None
+
+
+def serial_prefix_query(user_id: str, q: str) -> Optional[dict]:
+    key = serial_key(q)
+    if not key:
+        return None
+    # Anchored, case-sensitive regex on an indexed field is an index range scan
+    return {"user_id": user_id, "serienummer_key": {"$regex": f"^{re.escape(key)}"}}
+
+
+def looks_like_serial(q: str) -> bool:
+    return " " not in q.strip() and any(ch.isdigit() for ch in q)
@@ -1,44 +1,145 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Response, Request, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Response, Request, status, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, ReadPreference, InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+from pydantic import ValidationError
+from pydantic_core import to_jsonable_python
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
-import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Literal, Optional, Tuple
+from contextlib import asynccontextmanager
 import logging
 from pathlib import Path
 import uuid
-from datetime import datetime, timezone, timedelta
-from passlib.context import CryptContext
-import cloudinary
-import cloudinary.utils
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 import time
+import hashlib
+import functools
+import json
+import httpx
+import asyncio
+from cache import TTLCache
+from singleflight import SingleFlight
+from password_pool import PasswordPool, PoolSaturated
+from http_client import UpstreamClient, CircuitBreaker, CircuitOpen
+from indexes import ensure_indexes
+from timestamps import utcnow, as_datetime
+from sessions import store_session, enforce_session_cap, run_session_reaper, session_stats
+from search import serial_key, serial_prefix_query, looks_like_serial
+from export import csv_chunks, jsonl_chunks, pdf_chunks, gzip_chunks
+from imports import ImportQueue, ImportQueueFull
+from webhooks import WebhookConsumer, record_event
+from pubsub import PubSubHub, LocalBackend, MongoBackend
+from metrics import CommandTimer, PoolMonitor, TimingMiddleware, register_collector, register_stats, render as render_metrics
+from changelog import next_version, release_version, feed_window, record_changes, changes_after, run_tombstone_compactor
+from settings import Settings
+from responses import FastJSONResponse
+from pagination import InvalidCursor, encode_cursor, decode_cursor, keyset_filter
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Cloudinary configuration
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
+settings = Settings.from_env()
+
+# MongoDB connection, opened by the startup hook rather than at import so a
+# worker can be imported (and forked) without connecting. Timestamps are
+# stored as BSON dates and read back as aware UTC.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+# The same database with MONGO_READ_PREFERENCE, for the list, search, export
+# and summary reads that can be served by a secondary
+read_db = None
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+mongo_pool = PoolMonitor(max_size=settings.mongo_max_pool_size)
+
+def connect_mongo():
+    global client, db, read_db
+    if client is None:
+        if settings.mongo_read_preference not in READ_PREFERENCES:
+            raise ValueError(f"Invalid MONGO_READ_PREFERENCE, expected one of {', '.join(READ_PREFERENCES)}")
+        client = AsyncIOMotorClient(
+            settings.mongo_url,
+            tz_aware=True,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            connectTimeoutMS=settings.mongo_connect_timeout_ms,
+            socketTimeoutMS=settings.mongo_socket_timeout_ms,
+            event_listeners=[CommandTimer(), mongo_pool]
+        )
+        db = client[settings.db_name]
+        read_db = db.with_options(read_preference=READ_PREFERENCES[settings.mongo_read_preference])
+    return db
+
+@asynccontextmanager
+async def causal_session():
+    # Reads in the session see its earlier writes and reads, even on a secondary
+    async with await client.start_session(causal_consistency=True) as session:
+        yield session
+
+# Per-user inventory summaries, keyed by (user_id, collection version)
+summary_cache = TTLCache(maxsize=settings.summary_cache_size, ttl=settings.summary_cache_ttl)
+
+# Identical item list reads in flight at once (several tabs, or components
+# mounting together) share one query
+item_list_flights = SingleFlight()
+
+# Password hashing runs in a bounded worker pool so bcrypt never blocks the event loop
+password_pool = PasswordPool(
+    max_workers=settings.password_pool_workers,
+    max_pending=settings.password_pool_max_pending,
+    kind=settings.password_pool_kind
 )
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Resolved sessions, keyed by session token. Entries live for at most
+# SESSION_CACHE_TTL seconds so a logout on another worker is picked up quickly.
+session_cache = TTLCache(maxsize=settings.session_cache_size, ttl=settings.session_cache_ttl)
+
+# Cache misses for the same token, e.g. the parallel requests of a page load
+# after a deploy, share one lookup
+session_flights = SingleFlight()
+
+# Session lifetime
+SESSION_DAYS = 7
+
+# Shared HTTP client for the Emergent auth provider, started in the startup hook
+auth_http = UpstreamClient(
+    timeout=settings.auth_http_timeout,
+    retries=settings.auth_http_retries,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.auth_http_breaker_threshold,
+        reset_timeout=settings.auth_http_breaker_reset
+    )
+)
 
 # Create the main app without a prefix
 app = FastAPI()
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(
+    prefix="/api",
+    default_response_class=FastJSONResponse if settings.fast_json else JSONResponse
+)
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    # For content built from trusted documents: rendered directly, skipping response_model validation
+    if settings.fast_json:
+        return FastJSONResponse(content, status_code=status_code, headers=headers)
+    # pydantic-core converts models and dates in one pass; jsonable_encoder walks
+    # every model field in Python and costs more than the old response_model path
+    return JSONResponse(to_jsonable_python(content), status_code=status_code, headers=headers)
 
 # ========== MODELS ==========
 
@@ -70,6 +171,8 @@ class Item(BaseModel):
     vedlegg_urls: List[str] = []
     created_at: datetime
     updated_at: datetime
+    # Bumped on every write; exposed as the ETag for If-Match
+    version: int = 0
 
 # ========== REQUEST/RESPONSE MODELS ==========
 
@@ -94,6 +197,15 @@ class ItemCreate(BaseModel):
     valuta: str = "NOK"
     vedlegg_urls: List[str] = []
 
+class BulkItemOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    item_id: Optional[str] = None
+    # Validated per operation as ItemCreate/ItemUpdate so one bad row doesn't fail the batch
+    data: Optional[Dict[str, Any]] = None
+
+class BulkItemsRequest(BaseModel):
+    operations: List[BulkItemOperation]
+
 class ItemUpdate(BaseModel):
     navn: Optional[str] = None
     kategori: Optional[str] = None
@@ -118,6 +230,25 @@ async def get_current_user(request: Request) -> User:
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    now = utcnow()
+    
+    # Serve from cache when possible
+    cached = session_cache.get(session_token)
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at < now:
+            session_cache.invalidate(session_token)
+            raise HTTPException(status_code=401, detail="Session expired")
+        return user
+    
+    user, _ = await session_flights.do(session_token, lambda: load_session(session_token))
+    return user
+
+async def load_session(session_token: str) -> Tuple[User, datetime]:
+    # A logout or user update while the lookup is in flight must not be
+    # undone by caching what it read before
+    generation = session_cache.generation
+    
     # Find session
     session_doc = await db.user_sessions.find_one(
         {"session_token": session_token},
@@ -128,13 +259,10 @@ async def get_current_user(request: Request) -> User:
         raise HTTPException(status_code=401, detail="Invalid session")
     
     # Check expiry
-    expires_at = session_doc["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    now = utcnow()
+    expires_at = as_datetime(session_doc["expires_at"])
     
-    if expires_at < datetime.now(timezone.utc):
+    if expires_at < now:
         raise HTTPException(status_code=401, detail="Session expired")
     
     # Get user
@@ -146,11 +274,54 @@ async def get_current_user(request: Request) -> User:
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Convert timestamp
-    if isinstance(user_doc['created_at'], str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    # Convert timestamp (legacy documents still hold ISO strings)
+    user_doc['created_at'] = as_datetime(user_doc['created_at'])
+    
+    user = User(**user_doc)
+    session_cache.set(
+        session_token,
+        (user, expires_at),
+        ttl=(expires_at - now).total_seconds(),
+        generation=generation
+    )
     
-    return User(**user_doc)
+    return user, expires_at
+
+def invalidate_cached_user(user_id: str):
+    session_cache.invalidate_where(lambda _, entry: entry[0].user_id == user_id)
+
+async def hash_password(password: str) -> str:
+    try:
+        return await password_pool.hash(password)
+    except PoolSaturated:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    try:
+        return await password_pool.verify(password, password_hash)
+    except PoolSaturated:
+        raise HTTPException(status_code=503, detail="Server busy, try again", headers={"Retry-After": "1"})
+
+async def start_session(user_id: str, response: Response, session_token: Optional[str] = None):
+    session_token = session_token or f"session_{uuid.uuid4().hex}"
+    expires_at = utcnow() + timedelta(days=SESSION_DAYS)
+    
+    await store_session(db, user_id, session_token, expires_at)
+    
+    # Drop the oldest sessions beyond the per-user cap
+    for stale_token in await enforce_session_cap(db, user_id, settings.max_sessions_per_user):
+        session_cache.invalidate(stale_token)
+    
+    # Set cookie
+    response.set_cookie(
+        key="session_token",
+        value=session_token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        path="/",
+        max_age=SESSION_DAYS*24*60*60
+    )
 
 # ========== AUTH ROUTES ==========
 
@@ -163,7 +334,7 @@ async def signup(data: SignupRequest, response: Response):
     
     # Create user
     user_id = f"user_{uuid.uuid4().hex[:12]}"
-    password_hash = pwd_context.hash(data.password)
+    password_hash = await hash_password(data.password)
     
     user_doc = {
         "user_id": user_id,
@@ -171,34 +342,13 @@ async def signup(data: SignupRequest, response: Response):
         "name": data.name,
         "password_hash": password_hash,
         "picture": None,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
     await db.users.insert_one(user_doc)
     
     # Create session
-    session_token = f"session_{uuid.uuid4().hex}"
-    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-    
-    session_doc = {
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    await db.user_sessions.insert_one(session_doc)
-    
-    # Set cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        path="/",
-        max_age=7*24*60*60
-    )
+    await start_session(user_id, response)
     
     return {
         "user_id": user_id,
@@ -215,32 +365,11 @@ async def login(data: LoginRequest, response: Response):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not pwd_context.verify(data.password, user_doc["password_hash"]):
+    if not await verify_password(data.password, user_doc["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Create session
-    session_token = f"session_{uuid.uuid4().hex}"
-    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-    
-    session_doc = {
-        "user_id": user_doc["user_id"],
-        "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    await db.user_sessions.insert_one(session_doc)
-    
-    # Set cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        path="/",
-        max_age=7*24*60*60
-    )
+    await start_session(user_doc["user_id"], response)
     
     return {
         "user_id": user_doc["user_id"],
@@ -251,13 +380,16 @@ async def login(data: LoginRequest, response: Response):
 
 @api_router.post("/auth/session")
 async def exchange_emergent_session(data: EmergentSessionRequest, response: Response):
-    import requests
-    
     # Exchange session_id for user data
-    resp = requests.get(
-        "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-        headers={"X-Session-ID": data.session_id}
-    )
+    try:
+        resp = await auth_http.get(
+            settings.emergent_session_url,
+            headers={"X-Session-ID": data.session_id}
+        )
+    except CircuitOpen:
+        raise HTTPException(status_code=503, detail="Auth provider unavailable", headers={"Retry-After": "5"})
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Auth provider unavailable")
     
     if resp.status_code != 200:
         raise HTTPException(status_code=400, detail="Invalid session_id")
@@ -277,6 +409,7 @@ async def exchange_emergent_session(data: EmergentSessionRequest, response: Resp
             }}
         )
         user_id = user_doc["user_id"]
+        invalidate_cached_user(user_id)
     else:
         # Create new user
         user_id = f"user_{uuid.uuid4().hex[:12]}"
@@ -285,33 +418,12 @@ async def exchange_emergent_session(data: EmergentSessionRequest, response: Resp
             "email": session_data["email"],
             "name": session_data["name"],
             "picture": session_data.get("picture"),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         }
         await db.users.insert_one(user_doc)
     
     # Create session using token from Emergent
-    session_token = session_data["session_token"]
-    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-    
-    session_doc = {
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    await db.user_sessions.insert_one(session_doc)
-    
-    # Set cookie
-    response.set_cookie(
-        key="session_token",
-        value=session_token,
-        httponly=True,
-        secure=True,
-        samesite="none",
-        path="/",
-        max_age=7*24*60*60
-    )
+    await start_session(user_id, response, session_token=session_data["session_token"])
     
     return {
         "user_id": user_id,
@@ -329,7 +441,9 @@ async def logout(request: Request, response: Response):
     session_token = request.cookies.get("session_token")
     
     if session_token:
+        # Delete first so no lookup can read the session after it is invalidated
         await db.user_sessions.delete_one({"session_token": session_token})
+        session_cache.invalidate(session_token)
     
     response.delete_cookie(key="session_token", path="/")
     
@@ -337,88 +451,565 @@ async def logout(request: Request, response: Response):
 
 # ========== CLOUDINARY ROUTES ==========
 
+# Signatures are reused within a time window; Cloudinary accepts timestamps up to an hour old
+signature_cache = TTLCache(maxsize=10000, ttl=settings.cloudinary_signature_window)
+
+MAX_SIGNATURE_BATCH = 20
+
+@functools.lru_cache(maxsize=None)
+def cloudinary_utils():
+    # The SDK is only needed for signing, so it is imported on the first signature request
+    import cloudinary
+    import cloudinary.utils
+    cloudinary.config(
+        cloud_name=settings.cloudinary_cloud_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        secure=True
+    )
+    return cloudinary.utils
+
+class SignatureRequest(BaseModel):
+    resource_type: Literal["image", "raw"] = "image"
+    folder: str = "mitteie"
+
+class SignatureBatchRequest(BaseModel):
+    uploads: List[SignatureRequest]
+
+def sign_upload(user_id: str, folder: str, resource_type: str) -> dict:
+    window = settings.cloudinary_signature_window
+    timestamp = int(time.time()) // window * window
+    key = (user_id, folder, resource_type, timestamp)
+    
+    signed = signature_cache.get(key)
+    if signed is None:
+        params = {
+            "timestamp": timestamp,
+            "folder": folder,
+            "resource_type": resource_type
+        }
+        signed = {
+            "signature": cloudinary_utils().api_sign_request(params, settings.cloudinary_api_secret),
+            "timestamp": timestamp,
+            "cloud_name": settings.cloudinary_cloud_name,
+            "api_key": settings.cloudinary_api_key,
+            "folder": folder,
+            "resource_type": resource_type
+        }
+        # Expire with the window the timestamp belongs to
+        signature_cache.set(key, signed, ttl=timestamp + window - time.time())
+    
+    return signed
+
 @api_router.get("/cloudinary/signature")
 async def generate_cloudinary_signature(
     resource_type: str = Query("image", regex="^(image|raw)$"),
     folder: str = "mitteie",
-    _: User = Depends(get_current_user)
+    user: User = Depends(get_current_user)
 ):
-    timestamp = int(time.time())
-    params = {
-        "timestamp": timestamp,
-        "folder": folder,
-        "resource_type": resource_type
-    }
+    return sign_upload(user.user_id, folder, resource_type)
+
+@api_router.post("/cloudinary/signatures")
+async def generate_cloudinary_signatures(data: SignatureBatchRequest, user: User = Depends(get_current_user)):
+    # One signature covers every upload with the same folder and resource type
+    if len(data.uploads) > MAX_SIGNATURE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SIGNATURE_BATCH} uploads per request")
     
-    signature = cloudinary.utils.api_sign_request(
-        params,
-        os.getenv("CLOUDINARY_API_SECRET")
+    return {
+        "signatures": [
+            sign_upload(user.user_id, upload.folder, upload.resource_type)
+            for upload in data.uploads
+        ]
+    }
+
+# ========== ITEM ROUTES ==========
+
+# Allowed values for ?sort=, mapped to (field, direction). Ties are broken by item_id.
+ITEM_SORTS = {
+    "-updated_at": ("updated_at", -1),
+    "updated_at": ("updated_at", 1),
+    "-created_at": ("created_at", -1),
+    "created_at": ("created_at", 1),
+    "navn": ("navn", 1),
+    "-navn": ("navn", -1),
+    "verdi": ("verdi", 1),
+    "-verdi": ("verdi", -1),
+}
+
+ITEM_FIELDS = set(Item.model_fields)
+
+# GET /api/items pages; clients follow X-Next-Cursor for the rest
+ITEM_PAGE_SIZE = 100
+MAX_ITEM_PAGE_SIZE = 500
+
+# Live change feed for GET /api/items/stream, one channel per user; built in
+# the startup hook. The Mongo backend relays events between workers, the
+# local one only within a process.
+item_events: Optional[PubSubHub] = None
+
+async def items_changed(user_id: str, upserted: Iterable[str] = (), deleted: Iterable[str] = (), session=None) -> int:
+    # Called after every write to a user's items: bumps the version behind the
+    # list ETag and summary cache, and records the written items in the change log.
+    # The write itself has already happened, so a failure here doesn't fail the request.
+    seq, token = await next_version(db, user_id, session=session)
+    try:
+        await record_changes(db, user_id, seq, upserted, deleted, session=session)
+        recorded = True
+    except Exception as e:
+        # Released as a gap: change feed clients from before it resync
+        logger.error(f"Recording item changes for {user_id} at seq {seq} failed: {e}")
+        recorded = False
+    try:
+        committed = await release_version(db, user_id, seq, token, gap=not recorded, session=session)
+    except Exception as e:
+        # Left pending, the seq times out into a gap like one whose writer died
+        logger.error(f"Releasing seq {seq} for {user_id} failed: {e}")
+        return seq
+    await item_events.publish(user_id, {
+        "seq": seq,
+        # Behind seq while an earlier writer is still recording its changes
+        "cursor": encode_cursor("changes", committed, ""),
+        "upserted": list(upserted),
+        "deleted": list(deleted)
+    })
+    return seq
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" and "x" are the same validator
+    header = request.headers.get("If-None-Match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == opaque
+        for tag in (t.strip() for t in header.split(","))
     )
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if "If-None-Match" in request.headers:
+        return etag_matches(request, etag)
     
+    header = request.headers.get("If-Modified-Since")
+    if header is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return as_datetime(last_modified).replace(microsecond=0) <= since
+
+def conditional_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    # no-cache: browsers keep the body but revalidate on every request
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(as_datetime(last_modified))
+    return headers
+
+def parse_item_timestamps(item_doc: dict) -> dict:
+    # Returns a copy: coalesced list reads hand the same documents to several requests
     return {
-        "signature": signature,
-        "timestamp": timestamp,
-        "cloud_name": os.getenv("CLOUDINARY_CLOUD_NAME"),
-        "api_key": os.getenv("CLOUDINARY_API_KEY"),
-        "folder": folder,
-        "resource_type": resource_type
+        key: as_datetime(value) if key in ("created_at", "updated_at") else value
+        for key, value in item_doc.items()
     }
 
-# ========== ITEM ROUTES ==========
+ITEM_DEFAULTS = {name: field.default for name, field in Item.model_fields.items() if not field.is_required()}
 
-@api_router.get("/items", response_model=List[Item])
-async def get_items(user: User = Depends(get_current_user)):
-    items = await db.items.find(
-        {"user_id": user.user_id},
-        {"_id": 0}
-    ).to_list(1000)
+def item_out(item_doc: dict) -> Any:
+    item_doc = parse_item_timestamps(item_doc)
+    if not settings.fast_json:
+        return Item(**item_doc)
+    # Item documents are only written by this API, so they need no re-validation;
+    # older ones may lack fields added since
+    return {field: item_doc.get(field, ITEM_DEFAULTS.get(field)) for field in Item.model_fields}
+
+@api_router.get("/items")
+async def get_items(
+    request: Request,
+    limit: int = Query(ITEM_PAGE_SIZE, ge=1, le=MAX_ITEM_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "-updated_at",
+    fields: Optional[str] = None,
+    user: User = Depends(get_current_user)
+):
+    if sort not in ITEM_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort, expected one of {', '.join(ITEM_SORTS)}")
     
-    # Convert timestamps
-    for item in items:
-        if isinstance(item['created_at'], str):
-            item['created_at'] = datetime.fromisoformat(item['created_at'])
-        if isinstance(item['updated_at'], str):
-            item['updated_at'] = datetime.fromisoformat(item['updated_at'])
+    async with causal_session() as session:
+        return await list_items(request, limit, cursor, sort, fields, user, session)
+
+async def list_items(
+    request: Request,
+    limit: int,
+    cursor: Optional[str],
+    sort: str,
+    fields: Optional[str],
+    user: User,
+    session
+) -> Response:
+    sort_field, direction = ITEM_SORTS[sort]
+    
+    # The list body only changes when the user's collection version does; answer
+    # revalidations from the version document without reading any items. It is
+    # read from the primary; the items may come from a secondary, which the
+    # causal session holds back until it has caught up with this read.
+    version_doc = await db.item_versions.find_one({"user_id": user.user_id}, {"_id": 0}, session=session)
+    version = version_doc["version"] if version_doc else 0
+    last_modified = version_doc.get("updated_at") if version_doc else None
+    variant = hashlib.sha1(f"{user.user_id}?{request.url.query}".encode()).hexdigest()[:16]
+    etag = f'W/"{version}-{variant}"'
+    headers = conditional_headers(etag, last_modified)
+    # Start point for GET /api/items/changes; read before the items, so a
+    # concurrent write is sent again rather than missed
+    headers["X-Changes-Cursor"] = encode_cursor("changes", version, "")
+    
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    
+    # Projection: the list view can ask for just the columns it renders
+    projection = {"_id": 0}
+    requested = None
+    if fields:
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = requested - ITEM_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        requested.add("item_id")
+        for field in requested | {sort_field}:
+            projection[field] = 1
+    
+    query = {"user_id": user.user_id}
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query.update(keyset_filter(
+            sort_field, direction, last_value, last_id,
+            mixed_dates=sort_field in ("created_at", "updated_at")
+        ))
+    
+    # Concurrent requests for the same page at the same version share one
+    # read. It runs in its own session, which is caught up with this one's
+    # version read so the items are still at least as new as the ETag.
+    cluster_time, operation_time = session.cluster_time, session.operation_time
+    
+    async def fetch_items() -> List[dict]:
+        async with causal_session() as items_session:
+            if cluster_time is not None:
+                items_session.advance_cluster_time(cluster_time)
+            if operation_time is not None:
+                items_session.advance_operation_time(operation_time)
+            find = read_db.items.find(query, projection, session=items_session).sort(
+                [(sort_field, direction), ("item_id", direction)]
+            )
+            return await find.limit(limit + 1).to_list(limit + 1)
     
-    return items
+    items = await item_list_flights.do((user.user_id, request.url.query, version), fetch_items)
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        headers["X-Next-Cursor"] = encode_cursor(sort, last.get(sort_field), last["item_id"])
+    
+    if requested is None:
+        return json_response([item_out(item) for item in items], headers=headers)
+    
+    return json_response([
+        parse_item_timestamps({k: v for k, v in item.items() if k in requested})
+        for item in items
+    ], headers=headers)
 
-@api_router.post("/items", response_model=Item, status_code=201)
-async def create_item(data: ItemCreate, user: User = Depends(get_current_user)):
-    item_id = f"item_{uuid.uuid4().hex[:12]}"
-    now = datetime.now(timezone.utc)
+@api_router.get("/items/summary")
+async def get_items_summary(user: User = Depends(get_current_user)):
+    # Cached per collection version, so a write handled by any worker retires
+    # the entry. The version is read on the primary; the causal session makes
+    # a secondary wait until it has the writes that version counts.
+    async with causal_session() as session:
+        version_doc = await db.item_versions.find_one(
+            {"user_id": user.user_id}, {"_id": 0, "version": 1}, session=session
+        )
+        cache_key = (user.user_id, version_doc.get("version", 0) if version_doc else 0)
+        cached = summary_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # One group per (kategori, valuta); totals are never summed across currencies
+        groups = await read_db.items.aggregate([
+            {"$match": {"user_id": user.user_id}},
+            {"$group": {
+                "_id": {"kategori": "$kategori", "valuta": "$valuta"},
+                "count": {"$sum": 1},
+                "total": {"$sum": {"$ifNull": ["$verdi", 0]}}
+            }}
+        ], session=session).to_list(None)
     
-    item_doc = {
-        "item_id": item_id,
-        "user_id": user.user_id,
+    total_value: Dict[str, float] = {}
+    categories: Dict[Optional[str], dict] = {}
+    
+    for group in groups:
+        kategori = group["_id"].get("kategori")
+        valuta = group["_id"].get("valuta") or "NOK"
+        total_value[valuta] = total_value.get(valuta, 0) + group["total"]
+        
+        category = categories.setdefault(kategori, {"kategori": kategori, "count": 0, "total_value": {}})
+        category["count"] += group["count"]
+        category["total_value"][valuta] = category["total_value"].get(valuta, 0) + group["total"]
+    
+    summary = {
+        "item_count": sum(group["count"] for group in groups),
+        "total_value": total_value,
+        "categories": sorted(categories.values(), key=lambda c: (-c["count"], c["kategori"] or ""))
+    }
+    
+    summary_cache.set(cache_key, summary)
+    return summary
+
+@api_router.get("/items/search")
+async def search_items(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    page: int = Query(1, ge=1, le=50),
+    user: User = Depends(get_current_user)
+):
+    # Serial-number prefix matches rank first (exact before prefix), then full-text matches
+    skip = (page - 1) * limit
+    window = skip + limit + 1
+    results = []
+    seen = set()
+    
+    serial_query = serial_prefix_query(user.user_id, q) if looks_like_serial(q) else None
+    if serial_query:
+        key = serial_key(q)
+        serial_hits = await read_db.items.find(serial_query, {"_id": 0}).sort(
+            [("serienummer_key", 1), ("item_id", 1)]
+        ).limit(window).to_list(window)
+        serial_hits.sort(key=lambda doc: doc.get("serienummer_key") != key)
+        for doc in serial_hits:
+            seen.add(doc["item_id"])
+            results.append((doc, "serial", 1.0 if doc.get("serienummer_key") == key else 0.5))
+    
+    text_hits = await read_db.items.find(
+        {"user_id": user.user_id, "$text": {"$search": q}},
+        {"_id": 0, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).limit(window).to_list(window)
+    for doc in text_hits:
+        if doc["item_id"] not in seen:
+            results.append((doc, "text", doc.pop("score")))
+    
+    page_results = results[skip:skip + limit]
+    return json_response({
+        "results": [
+            {"item": item_out(doc), "match": match, "score": score}
+            for doc, match, score in page_results
+        ],
+        "page": page,
+        "has_more": len(results) > skip + limit
+    })
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "pdf": "application/pdf",
+}
+
+@api_router.get("/items/export")
+async def export_items(
+    format: str = Query("csv", regex="^(csv|jsonl|pdf)$"),
+    kategori: Optional[str] = None,
+    gzip: bool = False,
+    user: User = Depends(get_current_user)
+):
+    query = {"user_id": user.user_id}
+    if kategori is not None:
+        query["kategori"] = kategori
+    
+    # Rows are streamed straight from the cursor; the full set is never held in memory
+    docs = read_db.items.find(
+        query,
+        {"_id": 0, "user_id": 0, "serienummer_key": 0},
+        batch_size=500
+    ).sort([("created_at", 1), ("item_id", 1)])
+    
+    if format == "csv":
+        chunks = csv_chunks(docs)
+    elif format == "jsonl":
+        chunks = jsonl_chunks(docs)
+    else:
+        chunks = pdf_chunks(docs, title=f"Mitteie – inventarliste for {user.name}")
+    
+    headers = {
+        "Content-Disposition": f'attachment; filename="mitteie-export-{utcnow():%Y%m%d}.{format}"'
+    }
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(chunks, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
+@api_router.get("/items/changes")
+async def get_item_changes(
+    since: str,
+    limit: int = Query(500, ge=1, le=1000),
+    user: User = Depends(get_current_user)
+):
+    # `since` is the X-Changes-Cursor of a full GET /api/items, or the cursor of the previous call
+    try:
+        seq, last_id = decode_cursor(since, "changes")
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    version_doc = await db.item_versions.find_one({"user_id": user.user_id}, {"_id": 0}) or {}
+    horizon, committed = feed_window(version_doc)
+    if not isinstance(seq, int) or not horizon <= seq <= version_doc.get("version", 0):
+        # Tombstones this client has not seen were compacted away, or changes
+        # after its cursor could not be recorded
+        raise HTTPException(status_code=410, detail="Change cursor has expired, reload /api/items")
+    
+    entries = await db.item_changes.find(
+        changes_after(user.user_id, seq, last_id, committed),
+        {"_id": 0, "item_id": 1, "seq": 1, "deleted": 1}
+    ).sort([("seq", 1), ("item_id", 1)]).limit(limit + 1).to_list(limit + 1)
+    
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    cursor = since
+    if entries:
+        last = entries[-1]
+        cursor = encode_cursor("changes", last["seq"], last["item_id"] if has_more else "")
+    
+    changed_ids = [entry["item_id"] for entry in entries if not entry["deleted"]]
+    docs = {}
+    if changed_ids:
+        docs = {
+            doc["item_id"]: doc for doc in await db.items.find(
+                {"user_id": user.user_id, "item_id": {"$in": changed_ids}},
+                {"_id": 0}
+            ).to_list(None)
+        }
+    
+    return json_response({
+        # An item missing here was deleted since; its tombstone follows
+        "items": [item_out(docs[item_id]) for item_id in changed_ids if item_id in docs],
+        "deleted": [entry["item_id"] for entry in entries if entry["deleted"]],
+        "cursor": cursor,
+        "has_more": has_more
+    })
+
+@api_router.get("/items/stream")
+async def stream_item_changes(request: Request, user: User = Depends(get_current_user)):
+    # Each event carries the changed ids and a cursor for GET /api/items/changes
+    subscription = item_events.subscribe(user.user_id)
+    
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=settings.stream_heartbeat)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                if event is None:
+                    # Fell too far behind; the client reconnects and resyncs from its cursor
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                yield f"id: {event['cursor']}\nevent: change\ndata: {json.dumps(event)}\n\n"
+        finally:
+            item_events.unsubscribe(user.user_id, subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def item_write_fields(changes: dict) -> dict:
+    # Keep derived search fields in step with the fields they come from
+    if "serienummer" in changes:
+        changes = {**changes, "serienummer_key": serial_key(changes["serienummer"])}
+    return changes
+
+def new_item_doc(data: ItemCreate, user_id: str) -> dict:
+    now = utcnow()
+    return {
+        "item_id": f"item_{uuid.uuid4().hex[:12]}",
+        "user_id": user_id,
         "navn": data.navn,
         "kategori": data.kategori,
         "serienummer": data.serienummer,
+        "serienummer_key": serial_key(data.serienummer),
         "notat": data.notat,
         "verdi": data.verdi,
         "valuta": data.valuta,
         "vedlegg_urls": data.vedlegg_urls,
-        "created_at": now.isoformat(),
-        "updated_at": now.isoformat()
+        "created_at": now,
+        "updated_at": now,
+        "version": 1
     }
+
+@api_router.post("/items", response_model=Item, status_code=201)
+async def create_item(data: ItemCreate, user: User = Depends(get_current_user)):
+    item_doc = new_item_doc(data, user.user_id)
     
-    await db.items.insert_one(item_doc)
-    
-    return Item(
-        item_id=item_id,
-        user_id=user.user_id,
-        navn=data.navn,
-        kategori=data.kategori,
-        serienummer=data.serienummer,
-        notat=data.notat,
-        verdi=data.verdi,
-        valuta=data.valuta,
-        vedlegg_urls=data.vedlegg_urls,
-        created_at=now,
-        updated_at=now
-    )
+    async with causal_session() as session:
+        await db.items.insert_one(item_doc, session=session)
+        await items_changed(user.user_id, upserted=[item_doc["item_id"]], session=session)
+    
+    return json_response(item_out(item_doc), status_code=201, headers={"ETag": item_etag(item_doc)})
+
+def item_etag(item_doc: dict) -> str:
+    return f'"{item_doc.get("version", 0)}"'
+
+def parse_if_match(request: Request) -> Optional[int]:
+    header = request.headers.get("If-Match")
+    if header is None or header.strip() == "*":
+        return None
+    
+    value = header.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+async def apply_item_update(item_id: str, user: User, changes: dict, expected_version: Optional[int]) -> dict:
+    # Ownership, optional version check and write in a single round trip
+    query = {"item_id": item_id, "user_id": user.user_id}
+    if expected_version is not None:
+        # Items created before versioning have no version field
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+    
+    async with causal_session() as session:
+        item_doc = await db.items.find_one_and_update(
+            query,
+            {"$set": {**item_write_fields(changes), "updated_at": utcnow()}, "$inc": {"version": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        
+        if item_doc is None:
+            if expected_version is not None and await db.items.count_documents(
+                {"item_id": item_id, "user_id": user.user_id}, limit=1, session=session
+            ):
+                raise HTTPException(status_code=412, detail="Item was modified by someone else")
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        await items_changed(user.user_id, upserted=[item_id], session=session)
+    return item_doc
 
 @api_router.get("/items/{item_id}", response_model=Item)
-async def get_item(item_id: str, user: User = Depends(get_current_user)):
+async def get_item(item_id: str, request: Request, user: User = Depends(get_current_user)):
     item_doc = await db.items.find_one(
         {"item_id": item_id, "user_id": user.user_id},
         {"_id": 0}
@@ -427,80 +1018,207 @@ async def get_item(item_id: str, user: User = Depends(get_current_user)):
     if not item_doc:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    # Convert timestamps
-    if isinstance(item_doc['created_at'], str):
-        item_doc['created_at'] = datetime.fromisoformat(item_doc['created_at'])
-    if isinstance(item_doc['updated_at'], str):
-        item_doc['updated_at'] = datetime.fromisoformat(item_doc['updated_at'])
+    # The item ETag is its version, the same validator If-Match expects
+    etag = item_etag(item_doc)
+    headers = conditional_headers(etag, item_doc.get("updated_at"))
+    if is_not_modified(request, etag, item_doc.get("updated_at")):
+        return Response(status_code=304, headers=headers)
     
-    return Item(**item_doc)
+    return json_response(item_out(item_doc), headers=headers)
+
+# Fields that may be omitted from a PATCH but never set to null
+REQUIRED_ITEM_FIELDS = ("navn", "valuta", "vedlegg_urls")
 
 @api_router.put("/items/{item_id}", response_model=Item)
 async def update_item(
     item_id: str,
     data: ItemUpdate,
+    request: Request,
     user: User = Depends(get_current_user)
 ):
-    # Check ownership
-    existing = await db.items.find_one(
-        {"item_id": item_id, "user_id": user.user_id}
-    )
-    
-    if not existing:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    # Build update dict
-    update_dict = {"updated_at": datetime.now(timezone.utc).isoformat()}
-    
-    if data.navn is not None:
-        update_dict["navn"] = data.navn
-    if data.kategori is not None:
-        update_dict["kategori"] = data.kategori
-    if data.serienummer is not None:
-        update_dict["serienummer"] = data.serienummer
-    if data.notat is not None:
-        update_dict["notat"] = data.notat
-    if data.verdi is not None:
-        update_dict["verdi"] = data.verdi
-    if data.valuta is not None:
-        update_dict["valuta"] = data.valuta
-    if data.vedlegg_urls is not None:
-        update_dict["vedlegg_urls"] = data.vedlegg_urls
-    
-    await db.items.update_one(
-        {"item_id": item_id},
-        {"$set": update_dict}
-    )
+    # PUT keeps its original semantics: null/missing fields are left untouched
+    changes = data.model_dump(exclude_none=True)
+    item_doc = await apply_item_update(item_id, user, changes, parse_if_match(request))
     
-    # Fetch updated item
-    item_doc = await db.items.find_one(
-        {"item_id": item_id},
-        {"_id": 0}
-    )
+    return json_response(item_out(item_doc), headers={"ETag": item_etag(item_doc)})
+
+@api_router.patch("/items/{item_id}", response_model=Item)
+async def patch_item(
+    item_id: str,
+    data: ItemUpdate,
+    request: Request,
+    user: User = Depends(get_current_user)
+):
+    # Only fields present in the body are written; explicit null clears optional fields
+    changes = data.model_dump(exclude_unset=True)
+    for field in REQUIRED_ITEM_FIELDS:
+        if field in changes and changes[field] is None:
+            raise HTTPException(status_code=422, detail=f"{field} cannot be null")
     
-    # Convert timestamps
-    if isinstance(item_doc['created_at'], str):
-        item_doc['created_at'] = datetime.fromisoformat(item_doc['created_at'])
-    if isinstance(item_doc['updated_at'], str):
-        item_doc['updated_at'] = datetime.fromisoformat(item_doc['updated_at'])
+    item_doc = await apply_item_update(item_id, user, changes, parse_if_match(request))
     
-    return Item(**item_doc)
+    return json_response(item_out(item_doc), headers={"ETag": item_etag(item_doc)})
 
 @api_router.delete("/items/{item_id}")
 async def delete_item(item_id: str, user: User = Depends(get_current_user)):
-    result = await db.items.delete_one(
-        {"item_id": item_id, "user_id": user.user_id}
+    async with causal_session() as session:
+        result = await db.items.delete_one(
+            {"item_id": item_id, "user_id": user.user_id},
+            session=session
+        )
+        
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        await items_changed(user.user_id, deleted=[item_id], session=session)
+    return {"message": "Item deleted"}
+
+def validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+@api_router.post("/items/bulk")
+async def bulk_items(data: BulkItemsRequest, user: User = Depends(get_current_user)):
+    operations = data.operations
+    if len(operations) > settings.max_bulk_operations:
+        raise HTTPException(status_code=413, detail=f"At most {settings.max_bulk_operations} operations per request")
+    
+    async with causal_session() as session:
+        return await apply_bulk_operations(operations, user, session)
+
+async def apply_bulk_operations(operations: List[BulkItemOperation], user: User, session) -> dict:
+    results: List[Optional[dict]] = [None] * len(operations)
+    
+    # Resolve ownership of every referenced item in one query
+    referenced = {op.item_id for op in operations if op.op != "create" and op.item_id}
+    owned = set()
+    if referenced:
+        owned = {
+            doc["item_id"] for doc in await db.items.find(
+                {"user_id": user.user_id, "item_id": {"$in": list(referenced)}},
+                {"_id": 0, "item_id": 1},
+                session=session
+            ).to_list(None)
+        }
+    
+    writes = []
+    positions = []
+    now = utcnow()
+    
+    for index, operation in enumerate(operations):
+        try:
+            if operation.op == "create":
+                item_doc = new_item_doc(ItemCreate.model_validate(operation.data or {}), user.user_id)
+                writes.append(InsertOne(item_doc))
+                results[index] = {"op": "create", "status": 201, "item_id": item_doc["item_id"]}
+            
+            elif not operation.item_id:
+                results[index] = {"op": operation.op, "status": 400, "error": "item_id is required"}
+                continue
+            
+            elif operation.item_id not in owned:
+                results[index] = {"op": operation.op, "status": 404, "item_id": operation.item_id, "error": "Item not found"}
+                continue
+            
+            elif operation.op == "update":
+                # Same semantics as PATCH: only the provided fields are written
+                changes = ItemUpdate.model_validate(operation.data or {}).model_dump(exclude_unset=True)
+                null_fields = [f for f in REQUIRED_ITEM_FIELDS if f in changes and changes[f] is None]
+                if null_fields:
+                    results[index] = {"op": "update", "status": 422, "item_id": operation.item_id, "error": f"{null_fields[0]} cannot be null"}
+                    continue
+                writes.append(UpdateOne(
+                    {"item_id": operation.item_id, "user_id": user.user_id},
+                    {"$set": {**item_write_fields(changes), "updated_at": now}, "$inc": {"version": 1}}
+                ))
+                results[index] = {"op": "update", "status": 200, "item_id": operation.item_id}
+            
+            else:
+                writes.append(DeleteOne({"item_id": operation.item_id, "user_id": user.user_id}))
+                results[index] = {"op": "delete", "status": 200, "item_id": operation.item_id}
+        except ValidationError as e:
+            results[index] = {"op": operation.op, "status": 422, "error": validation_message(e)}
+            continue
+        
+        positions.append(index)
+    
+    if writes:
+        try:
+            await db.items.bulk_write(writes, ordered=False, session=session)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                index = positions[error["index"]]
+                results[index] = {**results[index], "status": 409, "error": error.get("errmsg", "Write failed")}
+        
+        succeeded = [result for result in results if result["status"] < 400]
+        await items_changed(
+            user.user_id,
+            upserted=[result["item_id"] for result in succeeded if result["op"] != "delete"],
+            deleted=[result["item_id"] for result in succeeded if result["op"] == "delete"],
+            session=session
+        )
+    
+    summary = {"created": 0, "updated": 0, "deleted": 0, "failed": 0}
+    for result in results:
+        if result["status"] >= 400:
+            summary["failed"] += 1
+        else:
+            summary[f"{result['op']}d"] += 1
+    
+    return {**summary, "results": results}
+
+
+# ========== IMPORT ROUTES ==========
+
+def item_from_import_row(row: dict, user_id: str) -> Optional[dict]:
+    try:
+        return new_item_doc(ItemCreate.model_validate(row), user_id)
+    except ValidationError:
+        return None
+
+# Built in the startup hook
+import_queue: Optional[ImportQueue] = None
+
+async def has_paid_package(user_id: str, package_id: str) -> bool:
+    transaction = await db.payment_transactions.find_one(
+        {"user_id": user_id, "package_id": package_id, "payment_status": "paid"},
+        {"_id": 1}
     )
+    return transaction is not None
+
+@api_router.post("/imports", status_code=202)
+async def create_import(file: UploadFile = File(...), user: User = Depends(get_current_user)):
+    if not await has_paid_package(user.user_id, "import"):
+        raise HTTPException(status_code=402, detail="PDF import requires the import package")
     
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Item not found")
+    data = await file.read(settings.import_max_bytes + 1)
+    if len(data) > settings.import_max_bytes:
+        raise HTTPException(status_code=413, detail="File too large")
+    if not data.startswith(b"%PDF"):
+        raise HTTPException(status_code=400, detail="File is not a PDF")
     
-    return {"message": "Item deleted"}
+    try:
+        return await import_queue.submit(user.user_id, file.filename or "import.pdf", data)
+    except ImportQueueFull:
+        raise HTTPException(status_code=503, detail="Import queue is full, try again later", headers={"Retry-After": "30"})
 
+@api_router.get("/imports/{job_id}")
+async def get_import(job_id: str, user: User = Depends(get_current_user)):
+    job = await db.import_jobs.find_one(
+        {"job_id": job_id, "user_id": user.user_id},
+        {"_id": 0}
+    )
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    
+    return job
 
 # ========== STRIPE PAYMENT ROUTES ==========
 
-from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
+from payments import PaymentsClient, PaymentsNotConfigured
+
+if TYPE_CHECKING:
+    from emergentintegrations.payments.stripe.checkout import CheckoutSessionResponse, CheckoutStatusResponse
 
 # Fixed payment packages - NEVER accept amounts from frontend
 PAYMENT_PACKAGES = {
@@ -508,6 +1226,13 @@ PAYMENT_PACKAGES = {
     "import": {"amount": 29.0, "currency": "NOK", "description": "Engangstillegg for PDF-import"}
 }
 
+# One Stripe client for the app's lifetime, created on first use
+payments = PaymentsClient(
+    api_key=settings.stripe_api_key,
+    webhook_url=settings.stripe_webhook_url,
+    status_ttl=settings.stripe_status_ttl
+)
+
 class PaymentRequest(BaseModel):
     package_id: str
     origin_url: str
@@ -520,18 +1245,17 @@ async def create_checkout_session(data: PaymentRequest, user: User = Depends(get
     
     package = PAYMENT_PACKAGES[data.package_id]
     
-    # Initialize Stripe
-    stripe_api_key = os.getenv("STRIPE_API_KEY")
-    if not stripe_api_key:
+    # Stripe client for this origin's webhook URL (reused across requests)
+    try:
+        stripe_checkout = payments.checkout_for(f"{data.origin_url}/api/webhook/stripe")
+    except PaymentsNotConfigured:
         raise HTTPException(status_code=500, detail="Stripe not configured")
     
-    webhook_url = f"{data.origin_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
-    
     # Create checkout session
     success_url = f"{data.origin_url}/payment-success?session_id={{{{CHECKOUT_SESSION_ID}}}}"
     cancel_url = f"{data.origin_url}/dashboard"
     
+    from emergentintegrations.payments.stripe.checkout import CheckoutSessionRequest
     checkout_request = CheckoutSessionRequest(
         amount=package["amount"],
         currency=package["currency"].lower(),
@@ -555,13 +1279,55 @@ async def create_checkout_session(data: PaymentRequest, user: User = Depends(get
         "amount": package["amount"],
         "currency": package["currency"],
         "payment_status": "pending",
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
     await db.payment_transactions.insert_one(transaction_doc)
     
     return {"url": session.url, "session_id": session.session_id}
 
+async def complete_payment(session_id: str) -> Optional[dict]:
+    # The pending -> paid transition can only succeed once
+    transaction = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id, "payment_status": {"$ne": "paid"}},
+        {"$set": {"payment_status": "paid", "completed_at": utcnow()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if transaction is None:
+        transaction = await db.payment_transactions.find_one({"session_id": session_id}, {"_id": 0})
+        if transaction is None or transaction.get("payment_status") != "paid":
+            return None
+    
+    # Idempotent, so a retry after a crash between the two writes still activates the user
+    if transaction["package_id"] == "subscription":
+        result = await db.users.update_one(
+            {"user_id": transaction["user_id"], "subscription_status": {"$ne": "active"}},
+            {"$set": {
+                "subscription_status": "active",
+                "subscription_started_at": utcnow()
+            }}
+        )
+        if result.modified_count:
+            invalidate_cached_user(transaction["user_id"])
+    
+    return transaction
+
+async def expire_payment(session_id: str):
+    await db.payment_transactions.update_one(
+        {"session_id": session_id, "payment_status": {"$nin": ["paid", "expired"]}},
+        {"$set": {"payment_status": "expired", "completed_at": utcnow()}}
+    )
+
+async def apply_stripe_event(event: dict):
+    if event["payment_status"] == "paid":
+        await complete_payment(event["session_id"])
+    elif event["event_type"] == "checkout.session.expired":
+        await expire_payment(event["session_id"])
+
+# Built in the startup hook
+webhook_consumer: Optional[WebhookConsumer] = None
+
 @api_router.get("/payments/status/{session_id}")
 async def get_payment_status(session_id: str, user: User = Depends(get_current_user)):
     # Check if transaction exists
@@ -573,36 +1339,23 @@ async def get_payment_status(session_id: str, user: User = Depends(get_current_u
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    # If already completed, return cached status
+    # Terminal states are served from Mongo without asking Stripe
     if transaction.get("payment_status") == "paid":
         return {"status": "complete", "payment_status": "paid", "package_id": transaction["package_id"]}
+    if transaction.get("payment_status") == "expired":
+        return {"status": "expired", "payment_status": "unpaid", "package_id": transaction["package_id"]}
     
-    # Poll Stripe for status
-    stripe_api_key = os.getenv("STRIPE_API_KEY")
-    webhook_url = f"https://dummy-webhook.com/stripe"  # Not used for status check
-    stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
-    
-    checkout_status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
+    # Poll Stripe for status (briefly cached, concurrent polls share one call)
+    try:
+        checkout_status: CheckoutStatusResponse = await payments.get_checkout_status(session_id)
+    except PaymentsNotConfigured:
+        raise HTTPException(status_code=500, detail="Stripe not configured")
     
-    # Update transaction if payment succeeded
-    if checkout_status.payment_status == "paid" and transaction.get("payment_status") != "paid":
-        await db.payment_transactions.update_one(
-            {"session_id": session_id},
-            {"$set": {
-                "payment_status": "paid",
-                "completed_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        
-        # Update user subscription status if subscription package
-        if transaction["package_id"] == "subscription":
-            await db.users.update_one(
-                {"user_id": user.user_id},
-                {"$set": {
-                    "subscription_status": "active",
-                    "subscription_started_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
+    # Record terminal states so later polls stop at Mongo
+    if checkout_status.payment_status == "paid":
+        await complete_payment(session_id)
+    elif checkout_status.status == "expired":
+        await expire_payment(session_id)
     
     return {
         "status": checkout_status.status,
@@ -616,27 +1369,18 @@ async def stripe_webhook(request: Request):
     body = await request.body()
     signature = request.headers.get("Stripe-Signature")
     
-    stripe_api_key = os.getenv("STRIPE_API_KEY")
-    webhook_url = f"{request.base_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
-    
     try:
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        # Update transaction status based on webhook
-        if webhook_response.payment_status == "paid":
-            await db.payment_transactions.update_one(
-                {"session_id": webhook_response.session_id},
-                {"$set": {
-                    "payment_status": "paid",
-                    "completed_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-        
-        return {"status": "success"}
+        webhook_response = await payments.handle_webhook(body, signature)
     except Exception as e:
         logger.error(f"Webhook error: {e}")
         raise HTTPException(status_code=400, detail="Webhook processing failed")
+    
+    # Persist and acknowledge; the consumer applies it in the background.
+    # Retries of an already recorded event are acknowledged without new work.
+    if await record_event(db, webhook_response):
+        webhook_consumer.notify()
+    
+    return {"status": "success"}
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -644,11 +1388,55 @@ app.include_router(api_router)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=["*"] if os.environ.get('CORS_ORIGINS') == '*' else os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(','),
+    allow_origins=settings.cors_origins,
     allow_methods=["*"],
     allow_headers=["*"],
-    allow_origin_regex=r"https://.*\.emergentagent\.com" if os.environ.get('CORS_ORIGINS') == '*' else None,
+    expose_headers=["X-Next-Cursor", "X-Changes-Cursor", "ETag", "Last-Modified"],
+    allow_origin_regex=r"https://.*\.emergentagent\.com" if settings.cors_allow_all else None,
+)
+
+# ========== METRICS ==========
+
+# Added last so it is the outermost middleware and times everything below it
+app.add_middleware(TimingMiddleware)
+
+# Running totals in the stats dicts, exported as counters; everything else is a gauge
+CACHE_COUNTERS = ("hits", "misses", "evictions")
+FLIGHT_COUNTERS = ("executed", "shared")
+
+register_stats("session_cache", session_cache.stats, counters=CACHE_COUNTERS)
+register_stats("summary_cache", summary_cache.stats, counters=CACHE_COUNTERS)
+register_stats("signature_cache", signature_cache.stats, counters=CACHE_COUNTERS)
+register_stats("session_flights", session_flights.stats, counters=FLIGHT_COUNTERS)
+register_stats("item_list_flights", item_list_flights.stats, counters=FLIGHT_COUNTERS)
+register_stats("password_pool", password_pool.stats, counters=(
+    "rejected",
+    *(f"{op}_{key}" for op in ("hash", "verify") for key in ("count", "total_seconds"))
+))
+register_stats("sessions", lambda: session_stats, counters=("reaped_legacy", "capped"))
+register_stats("auth_http_breaker", lambda: {
+    "failures": auth_http.breaker.failures,
+    "open": auth_http.breaker.state != "closed",
+    "trips": auth_http.breaker.trips
+}, counters=("trips",))
+register_stats("payments", payments.stats, counters=(
+    "upstream_status_calls",
+    *(f"status_cache_{key}" for key in CACHE_COUNTERS),
+    *(f"status_flights_{key}" for key in FLIGHT_COUNTERS)
+))
+register_collector(mongo_pool)
+register_stats(
+    "item_events",
+    lambda: item_events.stats() if item_events else {},
+    counters=("published", "delivered", "dropped")
 )
+register_stats("import_queue", lambda: {"queued": import_queue.queue.qsize()} if import_queue else {})
+
+# Served outside /api: the ingress only routes /api to the backend, so this
+# is reachable by an in-cluster scraper but not from the internet
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Configure logging
 logging.basicConfig(
@@ -657,6 +1445,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_clients():
+    global item_events, import_queue, webhook_consumer
+    connect_mongo()
+    
+    item_events = PubSubHub(
+        backend=MongoBackend(db) if settings.pubsub_backend == "mongo" else LocalBackend(),
+        queue_size=settings.stream_queue_size
+    )
+    import_queue = ImportQueue(
+        db,
+        make_item=item_from_import_row,
+        on_items_changed=items_changed,
+        workers=settings.import_workers,
+        max_queued=settings.import_max_queued
+    )
+    webhook_consumer = WebhookConsumer(db, apply_stripe_event)
+    
+    await ensure_indexes(db)
+    await auth_http.start()
+    await import_queue.start()
+    await item_events.start()
+    webhook_consumer.start()
+    app.state.session_reaper = asyncio.create_task(run_session_reaper(db, settings.session_reaper_interval))
+    app.state.tombstone_compactor = asyncio.create_task(run_tombstone_compactor(
+        db, settings.tombstone_compact_interval, timedelta(days=settings.tombstone_retention_days)
+    ))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.session_reaper.cancel()
+    app.state.tombstone_compactor.cancel()
+    await import_queue.stop()
+    await item_events.stop()
+    webhook_consumer.stop()
     client.close()
+    await auth_http.close()
+    password_pool.shutdown()
@@ -0,0 +1,80 @@
+from datetime import datetime
+from typing import List
+import asyncio
+import logging
+
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Updated by the reaper; exported alongside the other runtime stats
+session_stats = {
+    "active": 0,
+    "reaped_legacy": 0,
+    "capped": 0,
+    "last_reap_at": None,
+}
+
+
+async def store_session(db, user_id: str, session_token: str, expires_at: datetime):
+    # Upsert: the Emergent flow may hand us the same token more than once
+    await db.user_sessions.update_one(
+        {"session_token": session_token},
+        {"$set": {
+            "user_id": user_id,
+            "session_token": session_token,
+            "expires_at": expires_at,
+            "created_at": utcnow()
+        }},
+        upsert=True
+    )
+
+
+async def enforce_session_cap(db, user_id: str, cap: int) -> List[str]:
+    """Delete all but the ``cap`` newest sessions of a user; returns the removed tokens."""
+    stale = await db.user_sessions.find(
+        {"user_id": user_id},
+        {"_id": 0, "session_token": 1}
+    ).sort("created_at", -1).skip(cap).to_list(None)
+
+    tokens = [doc["session_token"] for doc in stale]
+    if tokens:
+        await db.user_sessions.delete_many({"session_token": {"$in": tokens}})
+        session_stats["capped"] += len(tokens)
+    return tokens
+
+
+async def count_active_sessions(db) -> int:
+    now = utcnow()
+    # Comparison is type-bracketed, so each branch only matches its own type
+    return await db.user_sessions.count_documents({"$or": [
+        {"expires_at": {"$gt": now}},
+        {"expires_at": {"$gt": now.isoformat()}},
+    ]})
+
+
+async def reap_legacy_sessions(db) -> int:
+    """Delete expired sessions whose expires_at is still an ISO string.
+
+    Date-typed sessions are removed by the TTL index on expires_at.
+    """
+    result = await db.user_sessions.delete_many(
+        {"expires_at": {"$type": "string", "$lt": utcnow().isoformat()}}
+    )
+    session_stats["reaped_legacy"] += result.deleted_count
+    return result.deleted_count
+
+
+async def run_session_reaper(db, interval: float):
+    while True:
+        try:
+            reaped = await reap_legacy_sessions(db)
+            session_stats["active"] = await count_active_sessions(db)
+            session_stats["last_reap_at"] = utcnow()
+            if reaped:
+                logger.info(f"Reaped {reaped} expired legacy sessions")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Session reaper failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import List, Optional
+import os
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.environ.get(name, str(default)))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Process configuration, read from the environment once at startup."""
+
+    # MongoDB
+    mongo_url: str
+    db_name: str
+    mongo_max_pool_size: int
+    mongo_min_pool_size: int
+    mongo_wait_queue_timeout_ms: int
+    mongo_server_selection_timeout_ms: int
+    mongo_connect_timeout_ms: int
+    mongo_socket_timeout_ms: int
+    # Read preference for list, search, export and summary reads
+    mongo_read_preference: str
+
+    # Responses
+    fast_json: bool
+
+    # CORS
+    cors_origins: List[str]
+    cors_allow_all: bool
+
+    # Cloudinary
+    cloudinary_cloud_name: Optional[str]
+    cloudinary_api_key: Optional[str]
+    cloudinary_api_secret: Optional[str]
+    cloudinary_signature_window: int
+
+    # Stripe
+    stripe_api_key: Optional[str]
+    stripe_webhook_url: str
+    stripe_status_ttl: float
+
+    # Sessions
+    session_cache_size: int
+    session_cache_ttl: float
+    max_sessions_per_user: int
+    session_reaper_interval: float
+
+    # Password hashing
+    password_pool_workers: int
+    password_pool_max_pending: int
+    password_pool_kind: str
+
+    # Emergent auth provider
+    emergent_session_url: str
+    auth_http_timeout: float
+    auth_http_retries: int
+    auth_http_breaker_threshold: int
+    auth_http_breaker_reset: float
+
+    # Items
+    summary_cache_size: int
+    summary_cache_ttl: float
+    max_bulk_operations: int
+    tombstone_retention_days: float
+    tombstone_compact_interval: float
+
+    # Live item feed
+    pubsub_backend: str
+    stream_heartbeat: float
+    stream_queue_size: int
+
+    # PDF import
+    import_max_bytes: int
+    import_workers: int
+    import_max_queued: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        cors = os.environ.get('CORS_ORIGINS', 'http://localhost:3000')
+        return cls(
+            mongo_url=os.environ['MONGO_URL'],
+            db_name=os.environ['DB_NAME'],
+            mongo_max_pool_size=_int('MONGO_MAX_POOL_SIZE', 100),
+            mongo_min_pool_size=_int('MONGO_MIN_POOL_SIZE', 0),
+            mongo_wait_queue_timeout_ms=_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000),
+            mongo_server_selection_timeout_ms=_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+            mongo_connect_timeout_ms=_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+            mongo_socket_timeout_ms=_int('MONGO_SOCKET_TIMEOUT_MS', 30000),
+            mongo_read_preference=os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+            fast_json=os.environ.get('FAST_JSON', '').lower() in ('1', 'true', 'yes'),
+            cors_origins=["*"] if cors == '*' else cors.split(','),
+            cors_allow_all=cors == '*',
+            cloudinary_cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            cloudinary_api_key=os.getenv("CLOUDINARY_API_KEY"),
+            cloudinary_api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            cloudinary_signature_window=_int('CLOUDINARY_SIGNATURE_WINDOW', 300),
+            stripe_api_key=os.getenv("STRIPE_API_KEY"),
+            stripe_webhook_url=os.environ.get('STRIPE_WEBHOOK_URL', "https://dummy-webhook.com/stripe"),
+            stripe_status_ttl=_float('STRIPE_STATUS_TTL', 3),
+            session_cache_size=_int('SESSION_CACHE_SIZE', 10000),
+            session_cache_ttl=_float('SESSION_CACHE_TTL', 60),
+            max_sessions_per_user=_int('MAX_SESSIONS_PER_USER', 10),
+            session_reaper_interval=_float('SESSION_REAPER_INTERVAL', 3600),
+            password_pool_workers=_int('PASSWORD_POOL_WORKERS', 2),
+            password_pool_max_pending=_int('PASSWORD_POOL_MAX_PENDING', 32),
+            password_pool_kind=os.environ.get('PASSWORD_POOL_KIND', 'thread'),
+            emergent_session_url=os.environ.get(
+                'EMERGENT_SESSION_URL',
+                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+            ),
+            auth_http_timeout=_float('AUTH_HTTP_TIMEOUT', 5),
+            auth_http_retries=_int('AUTH_HTTP_RETRIES', 2),
+            auth_http_breaker_threshold=_int('AUTH_HTTP_BREAKER_THRESHOLD', 5),
+            auth_http_breaker_reset=_float('AUTH_HTTP_BREAKER_RESET', 30),
+            summary_cache_size=_int('SUMMARY_CACHE_SIZE', 10000),
+            summary_cache_ttl=_float('SUMMARY_CACHE_TTL', 300),
+            max_bulk_operations=_int('MAX_BULK_OPERATIONS', 500),
+            tombstone_retention_days=_float('TOMBSTONE_RETENTION_DAYS', 30),
+            tombstone_compact_interval=_float('TOMBSTONE_COMPACT_INTERVAL', 3600),
+            pubsub_backend=os.environ.get('PUBSUB_BACKEND', 'local'),
+            stream_heartbeat=_float('STREAM_HEARTBEAT', 15),
+            stream_queue_size=_int('STREAM_QUEUE_SIZE', 100),
+            import_max_bytes=_int('IMPORT_MAX_BYTES', 10 * 1024 * 1024),
+            import_workers=_int('IMPORT_WORKERS', 2),
+            import_max_queued=_int('IMPORT_MAX_QUEUED', 20),
+        )
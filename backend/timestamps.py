@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+from typing import Any
+
+
+def utcnow() -> datetime:
+    # BSON dates only keep milliseconds; truncate so what we return matches what we store
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def as_datetime(value: Any) -> Any:
+    """Normalize a stored timestamp to an aware UTC datetime.
+
+    Accepts both native BSON dates and the ISO strings written before the
+    datetime migration; anything else (e.g. None) is returned unchanged.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+# A consumer that dies mid-event leaves it "processing"; reclaim it after this long
+LEASE_SECONDS = 60
+
+
+def event_key(event) -> str:
+    # Stripe event ids are unique per delivery attempt group; fall back to the
+    # session and outcome for payloads without one
+    if getattr(event, "event_id", None):
+        return event.event_id
+    return f"{event.session_id}:{event.event_type}:{event.payment_status}"
+
+
+async def record_event(db, event) -> bool:
+    """Persist a verified webhook event in the inbox.
+
+    Returns False if the event was already recorded (a Stripe retry).
+    """
+    now = utcnow()
+    try:
+        await db.stripe_events.insert_one({
+            "event_key": event_key(event),
+            "event_type": event.event_type,
+            "session_id": event.session_id,
+            "payment_status": event.payment_status,
+            "metadata": dict(getattr(event, "metadata", None) or {}),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "received_at": now,
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+class WebhookConsumer:
+    """Applies inbox events in the background, one at a time per consumer.
+
+    Events are claimed with an atomic find_one_and_update, so several
+    workers can run consumers side by side. ``apply`` must be idempotent:
+    an event can be re-applied if a consumer dies after applying it but
+    before marking it done.
+    """
+
+    def __init__(self, db, apply: Callable[[dict], Awaitable[None]], poll_interval: float = 30.0):
+        self.db = db
+        self.apply = apply
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def notify(self):
+        self._wake.set()
+
+    async def _claim(self) -> Optional[dict]:
+        now = utcnow()
+        return await self.db.stripe_events.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "processing", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "processing", "lease_until": now + timedelta(seconds=LEASE_SECONDS)},
+             "$inc": {"attempts": 1}},
+            sort=[("received_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def drain(self) -> int:
+        processed = 0
+        while True:
+            event = await self._claim()
+            if event is None:
+                return processed
+
+            try:
+                await self.apply(event)
+            except Exception as e:
+                failed = event["attempts"] >= MAX_ATTEMPTS
+                logger.error(f"Webhook event {event['event_key']} failed (attempt {event['attempts']}): {e}")
+                await self.db.stripe_events.update_one(
+                    {"_id": event["_id"]},
+                    {"$set": {
+                        "status": "failed" if failed else "pending",
+                        "error": str(e),
+                        "next_attempt_at": utcnow() + timedelta(seconds=2 ** event["attempts"]),
+                    }}
+                )
+            else:
+                await self.db.stripe_events.update_one(
+                    {"_id": event["_id"]},
+                    {"$set": {"status": "done", "processed_at": utcnow()}, "$unset": {"lease_until": ""}}
+                )
+            processed += 1
+
+    async def _run(self):
+        while True:
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook consumer error: {e}")
+
+            # Wake on new events, and poll for retries and events recorded by other workers
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
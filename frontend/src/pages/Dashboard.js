@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useNavigate, useLocation, Link } from "react-router-dom";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -21,6 +21,8 @@ import {
 } from "@/components/ui/alert-dialog";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const OWN_WRITE_WINDOW_MS = 10000;
+const ITEM_PAGE_SIZE = 200;
 
 export default function Dashboard() {
   const [user, setUser] = useState(null);
@@ -39,6 +41,11 @@ export default function Dashboard() {
   const [uploading, setUploading] = useState(false);
   const [saving, setSaving] = useState(false);
 
+  // Where GET /api/items/changes picks up from, and when this tab last wrote each item
+  const changesCursor = useRef(null);
+  const ownWrites = useRef(new Map());
+  const syncing = useRef(Promise.resolve());
+
   const navigate = useNavigate();
   const location = useLocation();
 
@@ -71,16 +78,91 @@ export default function Dashboard() {
     checkAuth();
   }, [location.state]);
 
+  // Apply changes made on other devices as deltas; this tab's own writes are already in state
+  useEffect(() => {
+    if (!isAuthenticated) return;
+
+    const source = new EventSource(`${BACKEND_URL}/api/items/stream`, {
+      withCredentials: true,
+    });
+    source.addEventListener("change", (e) => {
+      const { upserted, deleted } = JSON.parse(e.data);
+      const ids = [...upserted, ...deleted];
+      // The event for a write can also beat its response here; then it costs one small delta
+      const isOwn = (id) => Date.now() - (ownWrites.current.get(id) || 0) < OWN_WRITE_WINDOW_MS;
+      if (ids.every(isOwn)) {
+        ids.forEach((id) => ownWrites.current.delete(id));
+        return;
+      }
+      syncChanges();
+    });
+    source.addEventListener("overflow", () => syncChanges());
+
+    return () => source.close();
+  }, [isAuthenticated]);
+
+  const syncChanges = () => {
+    // One sync at a time, each continuing from the cursor the last one left
+    syncing.current = syncing.current.then(applyChanges);
+    return syncing.current;
+  };
+
+  const applyChanges = async () => {
+    if (!changesCursor.current) return loadItems();
+
+    try {
+      let hasMore = true;
+      while (hasMore) {
+        const response = await fetch(
+          `${BACKEND_URL}/api/items/changes?since=${encodeURIComponent(changesCursor.current)}`,
+          { credentials: "include" }
+        );
+        // 410: the cursor is older than the change log keeps, start over
+        if (response.status === 410) return loadItems();
+        if (!response.ok) throw new Error("Failed to load changes");
+
+        const page = await response.json();
+        const changed = new Map(page.items.map((item) => [item.item_id, item]));
+        const removed = new Set(page.deleted);
+        setItems((current) => [
+          ...current
+            .filter((item) => !removed.has(item.item_id))
+            .map((item) => changed.get(item.item_id) || item),
+          ...page.items.filter(
+            (item) => !current.some((existing) => existing.item_id === item.item_id)
+          ),
+        ]);
+        changesCursor.current = page.cursor;
+        hasMore = page.has_more;
+      }
+    } catch (error) {
+      toast.error("Kunne ikke oppdatere eiendeler");
+    }
+  };
+
   const loadItems = async () => {
     try {
-      const response = await fetch(`${BACKEND_URL}/api/items`, {
-        credentials: "include",
-      });
+      // Follow X-Next-Cursor page by page. The first page's X-Changes-Cursor
+      // covers anything written while the rest are loading.
+      const loaded = [];
+      let cursor = null;
+      let changesFrom = null;
+      do {
+        const params = new URLSearchParams({ limit: ITEM_PAGE_SIZE });
+        if (cursor) params.set("cursor", cursor);
+        const response = await fetch(`${BACKEND_URL}/api/items?${params}`, {
+          credentials: "include",
+        });
+
+        if (!response.ok) throw new Error("Failed to load items");
 
-      if (!response.ok) throw new Error("Failed to load items");
+        loaded.push(...(await response.json()));
+        changesFrom = changesFrom || response.headers.get("X-Changes-Cursor");
+        cursor = response.headers.get("X-Next-Cursor");
+      } while (cursor);
 
-      const data = await response.json();
-      setItems(data);
+      changesCursor.current = changesFrom;
+      setItems(loaded);
     } catch (error) {
       toast.error("Kunne ikke laste eiendeler");
     } finally {
@@ -130,6 +212,7 @@ export default function Dashboard() {
 
       if (!response.ok) throw new Error("Failed to delete");
 
+      ownWrites.current.set(itemId, Date.now());
       setItems(items.filter((item) => item.item_id !== itemId));
       toast.success("Eiendel fjernet");
     } catch (error) {
@@ -182,6 +265,7 @@ export default function Dashboard() {
       if (!response.ok) throw new Error("Failed to save");
 
       const savedItem = await response.json();
+      ownWrites.current.set(savedItem.item_id, Date.now());
 
       if (editingItem) {
         setItems(
@@ -5,6 +5,7 @@ import { Printer, ArrowLeft } from "lucide-react";
 import { toast } from "sonner";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const ITEM_PAGE_SIZE = 500;
 
 export default function Export() {
   const [items, setItems] = useState([]);
@@ -18,18 +19,17 @@ export default function Export() {
 
   const loadData = async () => {
     try {
-      const [userResponse, itemsResponse] = await Promise.all([
+      const [userResponse, itemsData] = await Promise.all([
         fetch(`${BACKEND_URL}/api/auth/me`, { credentials: "include" }),
-        fetch(`${BACKEND_URL}/api/items`, { credentials: "include" }),
+        loadAllItems(),
       ]);
 
-      if (!userResponse.ok || !itemsResponse.ok) {
+      if (!userResponse.ok || !itemsData) {
         navigate("/login");
         return;
       }
 
       const userData = await userResponse.json();
-      const itemsData = await itemsResponse.json();
 
       setUser(userData);
       setItems(itemsData);
@@ -41,6 +41,24 @@ export default function Export() {
     }
   };
 
+  // The list is paged; follow X-Next-Cursor until the last page
+  const loadAllItems = async () => {
+    const loaded = [];
+    let cursor = null;
+    do {
+      const params = new URLSearchParams({ limit: ITEM_PAGE_SIZE });
+      if (cursor) params.set("cursor", cursor);
+      const response = await fetch(`${BACKEND_URL}/api/items?${params}`, {
+        credentials: "include",
+      });
+      if (!response.ok) return null;
+
+      loaded.push(...(await response.json()));
+      cursor = response.headers.get("X-Next-Cursor");
+    } while (cursor);
+    return loaded;
+  };
+
   const handlePrint = () => {
     window.print();
   };
@@ -0,0 +1,107 @@
+from pathlib import Path
+import os
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server reads these at import; nothing connects until the startup hook runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "mitteie_test")
+
+from datetime import timedelta
+import asyncio
+
+import httpx
+import mongomock.collection
+import mongomock.not_implemented
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+
+class FakeSession:
+    # mongomock has no sessions; the server only passes them through and reads these
+    cluster_time = None
+    operation_time = None
+
+    def advance_cluster_time(self, cluster_time):
+        pass
+
+    def advance_operation_time(self, operation_time):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def _find_and_modify_by_id(original):
+    # mongomock finds the modified document again by _id, unless the projection
+    # hides it; then it re-runs the filter, which a version check no longer matches
+    def find_and_modify(self, query, projection=None, *args, **kwargs):
+        if projection is None or projection.get("_id", 1):
+            return original(self, query, projection, *args, **kwargs)
+        rest = {field: value for field, value in projection.items() if field != "_id"}
+        doc = original(self, query, rest or None, *args, **kwargs)
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
+    return find_and_modify
+
+
+class FakeClient:
+    async def start_session(self, **kwargs):
+        return FakeSession()
+
+
+@pytest.fixture
+def app_db(monkeypatch):
+    """Points the server at an in-memory database, as after the startup hook."""
+    import server
+    from pubsub import PubSubHub
+
+    mongomock.not_implemented.ignore_feature("session")
+    monkeypatch.setattr(
+        mongomock.collection.Collection, "_find_and_modify",
+        _find_and_modify_by_id(mongomock.collection.Collection._find_and_modify)
+    )
+    db = AsyncMongoMockClient()["test_app"]
+    monkeypatch.setattr(server, "client", FakeClient())
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "read_db", db)
+    monkeypatch.setattr(server, "item_events", PubSubHub())
+    server.session_cache.clear()
+    yield db
+    server.session_cache.clear()
+    mongomock.not_implemented.warn_on_feature("session")
+
+
+@pytest.fixture
+def login(app_db):
+    """Creates a user with a live session and returns its session token."""
+    from timestamps import utcnow
+
+    def login(user_id: str = "user_1") -> str:
+        now = utcnow()
+        token = f"session_{user_id}"
+        asyncio.run(app_db.users.insert_one({
+            "user_id": user_id, "email": f"{user_id}@example.com", "name": user_id, "created_at": now
+        }))
+        asyncio.run(app_db.user_sessions.insert_one({
+            "user_id": user_id, "session_token": token, "expires_at": now + timedelta(days=1), "created_at": now
+        }))
+        return token
+    return login
+
+
+@pytest.fixture
+def api(app_db):
+    """Returns a factory for clients of the app, optionally signed in with a session token."""
+    import server
+
+    def client(token: str = None) -> httpx.AsyncClient:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test", headers=headers)
+    return client
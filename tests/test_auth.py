@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import password_pool
+import server
+from password_pool import PasswordPool
+
+
+def test_logout_drops_the_cached_session(api, login):
+    token = login()
+
+    async def scenario():
+        async with api(token) as client:
+            assert (await client.get("/api/auth/me")).status_code == 200
+            assert server.session_cache.get(token) is not None
+
+            client.cookies.set("session_token", token)
+            assert (await client.post("/api/auth/logout")).status_code == 200
+
+            assert server.session_cache.get(token) is None
+            response = await client.get("/api/auth/me")
+            assert response.status_code == 401
+
+    asyncio.run(scenario())
+
+
+class PausedUsers:
+    """Holds user lookups until resumed, passing everything else to the real db."""
+
+    def __init__(self, db):
+        self.db = db
+        self.reading = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    @property
+    def users(self):
+        return self
+
+    async def find_one(self, *args, **kwargs):
+        self.reading.set()
+        await self.resume.wait()
+        return await self.db.users.find_one(*args, **kwargs)
+
+
+def test_lookup_in_flight_during_logout_is_not_cached(api, login, monkeypatch):
+    token = login()
+
+    async def scenario():
+        paused = PausedUsers(server.db)
+        monkeypatch.setattr(server, "db", paused)
+        lookup = asyncio.create_task(server.load_session(token))
+        await paused.reading.wait()
+
+        async with api() as client:
+            client.cookies.set("session_token", token)
+            assert (await client.post("/api/auth/logout")).status_code == 200
+
+            paused.resume.set()
+            await lookup
+            assert server.session_cache.get(token) is None
+
+            client.cookies.clear()
+            client.headers["Authorization"] = f"Bearer {token}"
+            assert (await client.get("/api/auth/me")).status_code == 401
+
+    asyncio.run(scenario())
+
+
+def test_saturated_password_pool_answers_503(api, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(password_pool, "_hash", lambda password: release.wait(5) and "hashed")
+    pool = PasswordPool(max_workers=1, max_pending=1)
+    monkeypatch.setattr(server, "password_pool", pool)
+
+    async def scenario():
+        # Holds the only slot until released
+        busy = asyncio.create_task(pool.hash("first"))
+        await asyncio.sleep(0)
+        try:
+            async with api() as client:
+                response = await client.post("/api/auth/signup", json={
+                    "email": "a@example.com", "password": "secret", "name": "A"
+                })
+        finally:
+            release.set()
+            await busy
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert pool.stats()["rejected"] == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
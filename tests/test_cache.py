@@ -0,0 +1,81 @@
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+
+    clock.now += 5
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    clock.now += 25
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_ttl_is_capped_by_the_cache_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+    cache.set("a", 1, ttl=3600)
+    cache.set("b", 2, ttl=0)
+
+    assert "b" not in cache._data
+    clock.now += 30
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=30, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_where_drops_matching_entries():
+    cache = TTLCache(maxsize=10, ttl=30, clock=FakeClock())
+    cache.set("session_1", ("user_1", 1))
+    cache.set("session_2", ("user_2", 2))
+    cache.set("session_3", ("user_1", 3))
+
+    assert cache.invalidate_where(lambda _, entry: entry[0] == "user_1") == 2
+
+    assert cache.get("session_1") is None
+    assert cache.get("session_3") is None
+    assert cache.get("session_2") == ("user_2", 2)
+
+
+def test_set_skips_values_loaded_before_an_invalidation():
+    cache = TTLCache(maxsize=10, ttl=30, clock=FakeClock())
+
+    generation = cache.generation
+    cache.invalidate_where(lambda key, value: value == "old")
+    cache.set("a", "old", generation=generation)
+    assert cache.get("a") is None
+
+    generation = cache.generation
+    cache.invalidate("b")
+    cache.set("b", "old", generation=generation)
+    assert cache.get("b") is None
+
+    cache.set("a", "new", generation=cache.generation)
+    assert cache.get("a") == "new"
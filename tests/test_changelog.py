@@ -0,0 +1,168 @@
+from datetime import timedelta
+import asyncio
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import changelog
+import server
+from changelog import feed_window, next_version, record_changes, release_version
+from pagination import encode_cursor
+from timestamps import utcnow
+
+USER = server.User(user_id="user_1", email="a@example.com", name="A", created_at=utcnow())
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient()["test_changelog"]
+    monkeypatch.setattr(server, "db", db)
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    yield db
+    server.app.dependency_overrides.clear()
+
+
+async def add_item(db, navn: str) -> str:
+    doc = server.new_item_doc(server.ItemCreate(navn=navn), USER.user_id)
+    await db.items.insert_one(doc)
+    return doc["item_id"]
+
+
+async def poll(since: str) -> dict:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/items/changes", params={"since": since})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_late_writer_is_not_skipped(db):
+    async def scenario():
+        await db.item_versions.create_index("user_id", unique=True)
+        first, second = await add_item(db, "Sofa"), await add_item(db, "Stol")
+
+        # Two writers take seqs 1 and 2, but the second records its change first
+        seq_a, token_a = await next_version(db, USER.user_id)
+        seq_b, token_b = await next_version(db, USER.user_id)
+        assert (seq_a, seq_b) == (1, 2)
+        await record_changes(db, USER.user_id, seq_b, upserted=[second])
+        assert await release_version(db, USER.user_id, seq_b, token_b) == 0
+
+        # A poll in between must not move the cursor past seq 1
+        start = encode_cursor("changes", 0, "")
+        page = await poll(start)
+        assert page["items"] == []
+        assert page["cursor"] == start
+
+        await record_changes(db, USER.user_id, seq_a, upserted=[first])
+        assert await release_version(db, USER.user_id, seq_a, token_a) == 2
+
+        page = await poll(page["cursor"])
+        assert [item["item_id"] for item in page["items"]] == [first, second]
+        assert (await poll(page["cursor"]))["items"] == []
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_bumps_get_distinct_seqs(db):
+    async def scenario():
+        await db.item_versions.create_index("user_id", unique=True)
+        tickets = await asyncio.gather(*(next_version(db, USER.user_id) for _ in range(10)))
+        assert sorted(seq for seq, _ in tickets) == list(range(1, 11))
+        version_doc = await db.item_versions.find_one({"user_id": USER.user_id})
+        assert version_doc["version"] == 10
+        assert feed_window(version_doc) == (0, 0)
+
+        # Released out of order, the feed advances only past a contiguous run
+        for seq, token in sorted(tickets, reverse=True)[:9]:
+            assert await release_version(db, USER.user_id, seq, token) == 0
+        assert await release_version(db, USER.user_id, *min(tickets)) == 10
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_seq_stops_holding_back_the_feed(db):
+    async def scenario():
+        await db.item_versions.create_index("user_id", unique=True)
+        await next_version(db, USER.user_id)
+        await release_version(db, USER.user_id, *await next_version(db, USER.user_id))
+
+        # The writer of seq 1 died; once its entry is old enough the feed
+        # serves past it, and cursors from before it must resync
+        stale = utcnow() - changelog.PENDING_TIMEOUT - timedelta(seconds=1)
+        await db.item_versions.update_one({"user_id": USER.user_id}, {"$set": {"pending.0.at": stale}})
+        version_doc = await db.item_versions.find_one({"user_id": USER.user_id})
+        assert feed_window(version_doc) == (1, 2)
+
+        await changelog.prune_pending(db)
+        version_doc = await db.item_versions.find_one({"user_id": USER.user_id})
+        assert (version_doc["pending"], version_doc["released"], version_doc["committed"]) == ([], [], 2)
+        assert feed_window(version_doc) == (1, 2)
+
+    asyncio.run(scenario())
+
+
+def test_released_seqs_are_compacted(db, monkeypatch):
+    monkeypatch.setattr(changelog, "COMPACT_RELEASED_AT", 3)
+
+    async def scenario():
+        blocked = await next_version(db, USER.user_id)
+        for _ in range(3):
+            await release_version(db, USER.user_id, *await next_version(db, USER.user_id))
+
+        # Nothing can be folded in while seq 1 is pending
+        version_doc = await db.item_versions.find_one({"user_id": USER.user_id})
+        assert (version_doc.get("committed", 0), sorted(version_doc["released"])) == (0, [2, 3, 4])
+
+        assert await release_version(db, USER.user_id, *blocked) == 4
+        version_doc = await db.item_versions.find_one({"user_id": USER.user_id})
+        assert (version_doc["committed"], version_doc["released"], version_doc["pending"]) == (4, [], [])
+
+        seq, token = await next_version(db, USER.user_id)
+        assert (seq, await release_version(db, USER.user_id, seq, token)) == (5, 5)
+
+    asyncio.run(scenario())
+
+
+def test_failed_change_record_forces_a_resync(app_db, api, login, monkeypatch):
+    token = login()
+
+    failing = False
+
+    async def flaky_record_changes(*args, **kwargs):
+        if failing:
+            raise RuntimeError("change log unavailable")
+        await record_changes(*args, **kwargs)
+
+    monkeypatch.setattr(server, "record_changes", flaky_record_changes)
+
+    async def scenario():
+        nonlocal failing
+        async with api(token) as client:
+            first = (await client.post("/api/items", json={"navn": "Sofa"})).json()["item_id"]
+            listed = await client.get("/api/items")
+            before = listed.headers["X-Changes-Cursor"]
+
+            # The item is written, but its change never reaches the log
+            failing = True
+            created = await client.post("/api/items", json={"navn": "Stol"})
+            assert created.status_code == 201
+            failing = False
+
+            version_doc = await app_db.item_versions.find_one({"user_id": "user_1"})
+            assert version_doc["pending"] == []
+            assert version_doc["horizon"] == 2
+
+            # A client from before the gap can't be brought up to date by deltas
+            response = await client.get("/api/items/changes", params={"since": before})
+            assert response.status_code == 410
+
+            # One that reloads after it carries on from there
+            reloaded = await client.get("/api/items")
+            assert [item["navn"] for item in reloaded.json()] == ["Stol", "Sofa"]
+            await client.patch(f"/api/items/{first}", json={"notat": "Ny"})
+            page = (await client.get("/api/items/changes", params={"since": reloaded.headers["X-Changes-Cursor"]})).json()
+            assert [item["item_id"] for item in page["items"]] == [first]
+
+    asyncio.run(scenario())
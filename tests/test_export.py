@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+import asyncio
+import csv
+import gzip
+import io
+import json
+import re
+
+import pypdf
+
+import export
+from export import PdfStreamWriter, csv_chunks, gzip_chunks, jsonl_chunks, pdf_chunks
+
+CREATED = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def item(n: int, **fields) -> dict:
+    return {
+        "item_id": f"item_{n:03}", "navn": f"Gjenstand {n}", "kategori": "Møbler", "serienummer": None,
+        "verdi": 100.0, "valuta": "NOK", "notat": None, "vedlegg_urls": [],
+        "created_at": CREATED, "updated_at": CREATED, **fields
+    }
+
+
+async def aiter(docs):
+    for doc in docs:
+        yield doc
+
+
+def collect(chunks) -> list:
+    async def run():
+        return [chunk async for chunk in chunks]
+    return asyncio.run(run())
+
+
+def test_pdf_xref_points_at_every_object():
+    rows = [item(n) for n in range(2 * PdfStreamWriter().lines_per_page)]
+    data = b"".join(collect(pdf_chunks(aiter(rows), title="Inventarliste")))
+
+    startxref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+    assert data[startxref:].startswith(b"xref\n")
+
+    header, *entries = data[startxref:].split(b"trailer")[0].decode().splitlines()[1:]
+    first, size = map(int, header.split())
+    assert (first, len(entries)) == (0, size)
+    assert entries[0] == "0000000000 65535 f "
+    for obj_id, entry in enumerate(entries[1:], start=1):
+        offset = int(entry.split()[0])
+        assert data[offset:].startswith(f"{obj_id} 0 obj\n".encode())
+
+    trailer = data.split(b"trailer\n")[1]
+    assert trailer.startswith(f"<< /Size {size} /Root 1 0 R >>".encode())
+
+
+def test_pdf_pages_hold_every_row_and_the_totals():
+    rows = [item(n) for n in range(150)] + [item(150, verdi=None), item(151, valuta="EUR", verdi=10.5)]
+    data = b"".join(collect(pdf_chunks(aiter(rows), title="Inventarliste for Åse")))
+
+    reader = pypdf.PdfReader(io.BytesIO(data), strict=True)
+    text = "\n".join(page.extract_text() for page in reader.pages)
+
+    assert len(reader.pages) == 3
+    assert "Inventarliste for Åse" in text
+    assert "Gjenstand 0" in text and "Gjenstand 151" in text
+    assert "Antall gjenstander: 152" in text
+    assert "Total verdi: 15 000.00 NOK" in text
+    assert "Total verdi: 10.50 EUR" in text
+
+
+def test_empty_pdf_still_has_a_page():
+    data = b"".join(collect(pdf_chunks(aiter([]), title="Tom")))
+    reader = pypdf.PdfReader(io.BytesIO(data), strict=True)
+    assert len(reader.pages) == 1
+    assert "Antall gjenstander: 0" in reader.pages[0].extract_text()
+
+
+def test_csv_rows(monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_ROWS", 2)
+    rows = [item(0, notat='Sa "hei", og gikk'), item(1, vedlegg_urls=["a.jpg", "b.pdf"]), item(2, verdi=None)]
+    chunks = collect(csv_chunks(aiter(rows)))
+
+    # A chunk per CHUNK_ROWS rows, then the rest
+    assert len(chunks) == 2
+    text = b"".join(chunks).decode()
+    assert text.startswith("\ufeff")
+
+    parsed = list(csv.reader(io.StringIO(text[1:])))
+    assert parsed[0] == export.EXPORT_COLUMNS
+    assert len(parsed) == 4
+    record = dict(zip(parsed[0], parsed[1]))
+    assert record["notat"] == 'Sa "hei", og gikk'
+    assert record["created_at"] == CREATED.isoformat()
+    assert record["serienummer"] == ""
+    assert dict(zip(parsed[0], parsed[2]))["vedlegg_urls"] == "a.jpg b.pdf"
+    assert dict(zip(parsed[0], parsed[3]))["verdi"] == ""
+
+
+def test_jsonl_rows(monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_ROWS", 2)
+    rows = [item(n) for n in range(3)]
+    chunks = collect(jsonl_chunks(aiter(rows)))
+
+    assert len(chunks) == 2
+    records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [record["item_id"] for record in records] == ["item_000", "item_001", "item_002"]
+    assert list(records[0]) == export.EXPORT_COLUMNS
+    assert records[0]["created_at"] == CREATED.isoformat()
+    assert records[0]["kategori"] == "Møbler"
+
+
+def test_gzip_round_trips():
+    rows = [item(n) for n in range(500)]
+    raw = b"".join(collect(csv_chunks(aiter(rows))))
+    compressed = b"".join(collect(gzip_chunks(csv_chunks(aiter(rows)))))
+
+    assert gzip.decompress(compressed) == raw
+    assert len(compressed) < len(raw)
+
+
+def test_export_endpoint(app_db, api, login):
+    token = login()
+    asyncio.run(app_db.items.insert_many([
+        {**item(n, kategori="Møbler" if n % 2 else "Verktøy"), "user_id": "user_1", "serienummer_key": None}
+        for n in range(5)
+    ]))
+
+    async def scenario():
+        async with api(token) as client:
+            plain = await client.get("/api/items/export", params={"format": "jsonl", "kategori": "Møbler"})
+            zipped = await client.get("/api/items/export", params={"format": "csv", "gzip": "true"})
+            pdf = await client.get("/api/items/export", params={"format": "pdf"})
+            return plain, zipped, pdf
+
+    plain, zipped, pdf = asyncio.run(scenario())
+
+    assert plain.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="mitteie-export-' in plain.headers["content-disposition"]
+    records = [json.loads(line) for line in plain.text.splitlines()]
+    assert [record["item_id"] for record in records] == ["item_001", "item_003"]
+
+    # httpx undoes the Content-Encoding
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert len(list(csv.reader(io.StringIO(zipped.content.decode()[1:])))) == 6
+
+    assert pdf.headers["content-type"] == "application/pdf"
+    assert len(pypdf.PdfReader(io.BytesIO(pdf.content), strict=True).pages) == 1
@@ -0,0 +1,144 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException, Response
+
+from http_client import CircuitBreaker, CircuitOpen, UpstreamClient
+
+
+class StandIn:
+    """Answers with a scripted sequence of statuses; an exception is raised instead."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        outcome = self.script.pop(0) if self.script else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"ok": outcome < 400})
+
+
+def upstream(stand_in: StandIn, retries: int = 2, threshold: int = 5) -> UpstreamClient:
+    return UpstreamClient(
+        retries=retries,
+        backoff=0,
+        breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=30),
+        transport=httpx.MockTransport(stand_in),
+    )
+
+
+def test_retries_5xx_until_success():
+    stand_in = StandIn(503, 502, 200)
+    response = asyncio.run(upstream(stand_in).get("http://auth.test/session"))
+    assert response.status_code == 200
+    assert stand_in.calls == 3
+
+
+def test_retries_transport_errors():
+    stand_in = StandIn(httpx.ConnectError("refused"), 200)
+    response = asyncio.run(upstream(stand_in).get("http://auth.test/session"))
+    assert response.status_code == 200
+    assert stand_in.calls == 2
+
+
+def test_4xx_is_not_retried():
+    stand_in = StandIn(404)
+    response = asyncio.run(upstream(stand_in).get("http://auth.test/session"))
+    assert response.status_code == 404
+    assert stand_in.calls == 1
+
+
+def test_gives_up_after_retries():
+    stand_in = StandIn(500, 500, 500, 200)
+    client = upstream(stand_in)
+    response = asyncio.run(client.get("http://auth.test/session"))
+    assert response.status_code == 500
+    assert stand_in.calls == 3
+    assert client.breaker.failures == 1
+
+
+def test_breaker_opens_then_half_opens():
+    stand_in = StandIn(*[httpx.ConnectError("refused")] * 2)
+    client = upstream(stand_in, retries=0, threshold=2)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await client.get("http://auth.test/session")
+        assert client.breaker.state == "open"
+
+        # Fails fast without touching the upstream
+        with pytest.raises(CircuitOpen):
+            await client.get("http://auth.test/session")
+        assert stand_in.calls == 2
+
+        client.breaker.opened_at -= client.breaker.reset_timeout
+        assert client.breaker.state == "half-open"
+
+        # The trial call goes through and closes the breaker on success
+        response = await client.get("http://auth.test/session")
+        assert response.status_code == 200
+        assert client.breaker.state == "closed"
+        assert stand_in.calls == 3
+
+    asyncio.run(scenario())
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+
+    breaker.before_call()
+    # Others keep failing fast until the trial reports back
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_failed_trial_reopens_breaker():
+    stand_in = StandIn(httpx.ConnectError("refused"), httpx.ConnectError("refused"))
+    client = upstream(stand_in, retries=0, threshold=1)
+
+    async def scenario():
+        with pytest.raises(httpx.ConnectError):
+            await client.get("http://auth.test/session")
+        client.breaker.opened_at -= client.breaker.reset_timeout
+        with pytest.raises(httpx.ConnectError):
+            await client.get("http://auth.test/session")
+        assert client.breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def exchange(monkeypatch, client: UpstreamClient) -> HTTPException:
+    import server
+    monkeypatch.setattr(server, "auth_http", client)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(server.exchange_emergent_session(
+            server.EmergentSessionRequest(session_id="abc"), Response()
+        ))
+    return raised.value
+
+
+def test_exchange_maps_transport_failure_to_502(monkeypatch):
+    stand_in = StandIn(*[httpx.ConnectError("refused")] * 3)
+    error = exchange(monkeypatch, upstream(stand_in))
+    assert error.status_code == 502
+    assert stand_in.calls == 3
+
+
+def test_exchange_maps_open_breaker_to_503(monkeypatch):
+    client = upstream(StandIn(), threshold=1)
+    client.breaker.record_failure()
+    error = exchange(monkeypatch, client)
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "5"
+
+
+def test_exchange_rejects_unknown_session(monkeypatch):
+    error = exchange(monkeypatch, upstream(StandIn(401)))
+    assert error.status_code == 400
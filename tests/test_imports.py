@@ -0,0 +1,36 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+import imports
+from imports import ImportQueue
+
+
+def test_partial_failure_still_reports_inserted_items(monkeypatch):
+    db = AsyncMongoMockClient()["test_imports"]
+    rows = [{"item_id": f"item_{n}"} for n in range(5)]
+    monkeypatch.setattr(imports, "INSERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(imports, "extract_rows", lambda pdf_bytes: {"pages": 1, "rows": rows})
+
+    changed = []
+
+    async def on_items_changed(user_id, item_ids):
+        changed.append((user_id, item_ids))
+        return 1
+
+    async def scenario():
+        await db.items.create_index("item_id", unique=True)
+        # Collides with the second document of the second batch
+        await db.items.insert_one({"item_id": "item_3", "user_id": "someone_else"})
+
+        queue = ImportQueue(db, make_item=lambda row, user_id: {**row, "user_id": user_id}, on_items_changed=on_items_changed)
+        worker = asyncio.create_task(queue._worker())
+        job = await queue.submit("user_1", "list.pdf", b"%PDF")
+        await queue.queue.join()
+        worker.cancel()
+        return await db.import_jobs.find_one({"job_id": job["job_id"]})
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "failed"
+    assert changed == [("user_1", ["item_0", "item_1", "item_2"])]
@@ -0,0 +1,282 @@
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import asyncio
+import uuid
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("fast_json", [False, True])
+def test_item_out_leaves_shared_documents_untouched(monkeypatch, fast_json):
+    # Coalesced list reads share these documents; a legacy string timestamp
+    # must still be a string when the next request builds its cursor
+    monkeypatch.setattr(server, "settings", replace(server.settings, fast_json=fast_json))
+    doc = {
+        "item_id": "item_1", "user_id": "user_1", "navn": "Sofa", "valuta": "NOK", "vedlegg_urls": [],
+        "created_at": "2023-01-02T03:04:05+00:00", "updated_at": "2023-01-02T03:04:05+00:00",
+    }
+    before = dict(doc)
+
+    out = server.item_out(doc)
+
+    assert doc == before
+    updated_at = out["updated_at"] if fast_json else out.updated_at
+    assert isinstance(updated_at, datetime)
+
+
+def add_items(db, docs):
+    asyncio.run(db.items.insert_many([
+        {"user_id": "user_1", "navn": "Item", "valuta": "NOK", "vedlegg_urls": [], **doc} for doc in docs
+    ]))
+
+
+def walk(api, token, **params):
+    async def scenario():
+        pages = []
+        async with api(token) as client:
+            cursor = None
+            while True:
+                response = await client.get("/api/items", params={**params, **({"cursor": cursor} if cursor else {})})
+                assert response.status_code == 200, response.text
+                pages.append([item["item_id"] for item in response.json()])
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    return pages
+    return asyncio.run(scenario())
+
+
+def test_list_is_paged_by_default(app_db, api, login):
+    token = login()
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    add_items(app_db, [
+        {"item_id": f"item_{n:03}", "created_at": now, "updated_at": now + timedelta(seconds=n)}
+        for n in range(server.ITEM_PAGE_SIZE + 5)
+    ])
+
+    pages = walk(api, token)
+
+    assert [len(page) for page in pages] == [server.ITEM_PAGE_SIZE, 5]
+    assert pages[0][0] == f"item_{server.ITEM_PAGE_SIZE + 4:03}"
+
+
+@pytest.mark.parametrize("sort", ["verdi", "-verdi"])
+def test_paging_walks_through_null_values(app_db, api, login, sort):
+    token = login()
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    values = [None, 5.0, None, 1.0, 5.0, None, 3.0]
+    add_items(app_db, [
+        {"item_id": f"item_{n}", "verdi": value, "created_at": now, "updated_at": now}
+        for n, value in enumerate(values)
+    ])
+
+    pages = walk(api, token, sort=sort, limit=2)
+
+    seen = [item_id for page in pages for item_id in page]
+    # Nulls sort first, ties by item_id in the same direction
+    expected = ["item_0", "item_2", "item_5", "item_3", "item_6", "item_1", "item_4"]
+    assert seen == (expected if sort == "verdi" else expected[::-1])
+
+
+@pytest.mark.parametrize("sort", ["updated_at", "-updated_at"])
+def test_paging_crosses_between_legacy_string_and_date_timestamps(app_db, api, login, sort):
+    token = login()
+    legacy = ["2023-01-01T00:00:00+00:00", "2023-06-01T00:00:00+00:00", "2023-09-01T00:00:00+00:00"]
+    dates = [datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 1, tzinfo=timezone.utc)]
+    add_items(app_db, [
+        {"item_id": f"legacy_{n}", "created_at": value, "updated_at": value} for n, value in enumerate(legacy)
+    ] + [
+        {"item_id": f"native_{n}", "created_at": value, "updated_at": value} for n, value in enumerate(dates)
+    ])
+
+    pages = walk(api, token, sort=sort, limit=2)
+
+    seen = [item_id for page in pages for item_id in page]
+    # Strings sort before dates whatever they say
+    expected = ["legacy_0", "legacy_1", "legacy_2", "native_0", "native_1"]
+    assert seen == (expected if sort == "updated_at" else expected[::-1])
+
+
+def create_item(client, **fields):
+    return client.post("/api/items", json={"navn": "Sofa", **fields})
+
+
+def test_if_match_with_a_stale_version_is_rejected(api, login):
+    token = login()
+
+    async def scenario():
+        async with api(token) as client:
+            created = await create_item(client, kategori="Møbler")
+            item_id, etag = created.json()["item_id"], created.headers["ETag"]
+
+            first = await client.put(f"/api/items/{item_id}", json={"navn": "Sofa 2"}, headers={"If-Match": etag})
+            assert first.status_code == 200, first.text
+            assert first.headers["ETag"] != etag
+
+            stale = await client.put(f"/api/items/{item_id}", json={"navn": "Sofa 3"}, headers={"If-Match": etag})
+            assert stale.status_code == 412
+
+            current = await client.get(f"/api/items/{item_id}")
+            assert current.json()["navn"] == "Sofa 2"
+
+            retried = await client.patch(
+                f"/api/items/{item_id}", json={"navn": "Sofa 3"}, headers={"If-Match": current.headers["ETag"]}
+            )
+            assert retried.status_code == 200
+            assert retried.json()["navn"] == "Sofa 3"
+
+    asyncio.run(scenario())
+
+
+def test_if_match_on_a_missing_item_is_404(api, login):
+    token = login()
+
+    async def scenario():
+        async with api(token) as client:
+            response = await client.put("/api/items/item_missing", json={"navn": "X"}, headers={"If-Match": '"1"'})
+            assert response.status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_patch_clears_null_fields_and_keeps_missing_ones(api, login):
+    token = login()
+
+    async def scenario():
+        async with api(token) as client:
+            created = await create_item(client, kategori="Møbler", notat="Arvet", verdi=1000)
+            item_id = created.json()["item_id"]
+
+            patched = await client.patch(f"/api/items/{item_id}", json={"notat": None, "verdi": 1200})
+            assert patched.status_code == 200
+            item = patched.json()
+            assert (item["notat"], item["verdi"], item["kategori"], item["navn"]) == (None, 1200, "Møbler", "Sofa")
+
+            # PUT keeps its old meaning: null leaves the field alone
+            put = await client.put(f"/api/items/{item_id}", json={"kategori": None, "notat": "Ny"})
+            assert (put.json()["kategori"], put.json()["notat"]) == ("Møbler", "Ny")
+
+            required = await client.patch(f"/api/items/{item_id}", json={"navn": None})
+            assert required.status_code == 422
+
+    asyncio.run(scenario())
+
+
+def test_bulk_reports_each_operation_and_maps_duplicates_to_409(app_db, api, login, monkeypatch):
+    token = login()
+    login("user_2")
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    asyncio.run(app_db.items.create_index("item_id", unique=True))
+    add_items(app_db, [
+        {"item_id": "item_aaaaaaaaaaaa", "navn": "Sofa", "created_at": now, "updated_at": now},
+        {"item_id": "item_bbbbbbbbbbbb", "navn": "Stol", "created_at": now, "updated_at": now},
+    ])
+    asyncio.run(app_db.items.insert_one({"item_id": "item_other", "user_id": "user_2", "navn": "Bord"}))
+
+    # Skipped operations shift the write indexes the 409 is mapped back from.
+    # The second create gets the id of an existing item
+    ids = iter([uuid.UUID(int=0x1c), uuid.UUID("aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa")])
+    monkeypatch.setattr(server, "uuid", SimpleNamespace(uuid4=lambda: next(ids)))
+
+    operations = [
+        {"op": "delete"},
+        {"op": "create", "data": {"navn": "Lampe"}},
+        {"op": "create", "data": {"navn": "Duplikat"}},
+        {"op": "update", "item_id": "item_aaaaaaaaaaaa", "data": {"notat": "Ny"}},
+        {"op": "update", "item_id": "item_other", "data": {"notat": "Ny"}},
+        {"op": "delete", "item_id": "item_bbbbbbbbbbbb"},
+        {"op": "create", "data": {"kategori": "Uten navn"}},
+        {"op": "update", "item_id": "item_aaaaaaaaaaaa", "data": {"navn": None}},
+    ]
+
+    async def scenario():
+        async with api(token) as client:
+            response = await client.post("/api/items/bulk", json={"operations": operations})
+            assert response.status_code == 200, response.text
+            return response.json()
+
+    body = asyncio.run(scenario())
+
+    assert [result["status"] for result in body["results"]] == [400, 201, 409, 200, 404, 200, 422, 422]
+    assert body["results"][1]["item_id"] == "item_000000000000"
+    assert {key: body[key] for key in ("created", "updated", "deleted", "failed")} == {
+        "created": 1, "updated": 1, "deleted": 1, "failed": 5
+    }
+
+    # The rest of the batch was applied around the failed insert
+    docs = {doc["item_id"]: doc for doc in asyncio.run(app_db.items.find({"user_id": "user_1"}).to_list(None))}
+    assert set(docs) == {"item_000000000000", "item_aaaaaaaaaaaa"}
+    assert (docs["item_aaaaaaaaaaaa"]["navn"], docs["item_aaaaaaaaaaaa"]["notat"]) == ("Sofa", "Ny")
+    assert asyncio.run(app_db.items.count_documents({"item_id": "item_other", "notat": "Ny"})) == 0
+
+    # Only the writes that landed are in the change log
+    changes = {
+        entry["item_id"]: entry["deleted"]
+        for entry in asyncio.run(app_db.item_changes.find({"user_id": "user_1"}).to_list(None))
+    }
+    assert changes == {"item_000000000000": False, "item_aaaaaaaaaaaa": False, "item_bbbbbbbbbbbb": True}
+
+
+def test_list_revalidation(api, login):
+    token = login()
+
+    async def scenario():
+        async with api(token) as client:
+            await create_item(client)
+            first = await client.get("/api/items")
+            etag = first.headers["ETag"]
+            assert etag.startswith('W/"')
+
+            async def status(if_none_match: str, **headers) -> int:
+                response = await client.get("/api/items", headers={"If-None-Match": if_none_match, **headers})
+                if response.status_code == 304:
+                    assert response.content == b""
+                    assert response.headers["ETag"] == etag
+                return response.status_code
+
+            assert await status(etag) == 304
+            # Weak comparison: the strong form of the same tag matches too
+            assert await status(etag[2:]) == 304
+            assert await status(f'"other", {etag}') == 304
+            assert await status("*") == 304
+            assert await status('"other", W/"1-abc"') == 200
+            assert await status("not an etag") == 200
+            # If-None-Match wins over If-Modified-Since
+            assert await status('"other"', **{"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}) == 200
+
+            # Another query is another representation
+            other = await client.get("/api/items", params={"sort": "navn"}, headers={"If-None-Match": etag})
+            assert other.status_code == 200
+
+            await create_item(client, navn="Stol")
+            after = await client.get("/api/items", headers={"If-None-Match": etag})
+            assert after.status_code == 200
+            assert after.headers["ETag"] != etag
+            assert len(after.json()) == 2
+
+    asyncio.run(scenario())
+
+
+def test_item_revalidation(api, login):
+    token = login()
+
+    async def scenario():
+        async with api(token) as client:
+            item_id = (await create_item(client)).json()["item_id"]
+            first = await client.get(f"/api/items/{item_id}")
+            assert first.headers["ETag"] == '"1"'
+
+            assert (await client.get(f"/api/items/{item_id}", headers={"If-None-Match": 'W/"1"'})).status_code == 304
+            assert (await client.get(f"/api/items/{item_id}", headers={"If-None-Match": '"0", "1"'})).status_code == 304
+            since = first.headers["Last-Modified"]
+            assert (await client.get(f"/api/items/{item_id}", headers={"If-Modified-Since": since})).status_code == 304
+            assert (await client.get(f"/api/items/{item_id}", headers={"If-Modified-Since": "garbage"})).status_code == 200
+
+            await client.patch(f"/api/items/{item_id}", json={"notat": "Ny"})
+            after = await client.get(f"/api/items/{item_id}", headers={"If-None-Match": '"1"'})
+            assert after.status_code == 200
+            assert after.headers["ETag"] == '"2"'
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from metrics import PoolMonitor
+
+PRIMARY = ("db-0", 27017)
+SECONDARY = ("db-1", 27017)
+
+
+def event(address, **fields):
+    return SimpleNamespace(address=address, **fields)
+
+
+def check_out(monitor, address):
+    monitor.connection_created(event(address))
+    monitor.connection_check_out_started(event(address))
+    monitor.connection_checked_out(event(address))
+
+
+def test_saturation_is_per_server():
+    monitor = PoolMonitor(max_size=2)
+    for address in (PRIMARY, SECONDARY):
+        monitor.pool_created(event(address))
+
+    check_out(monitor, PRIMARY)
+    check_out(monitor, SECONDARY)
+    check_out(monitor, SECONDARY)
+    monitor.connection_check_out_started(event(SECONDARY))
+
+    stats = monitor.stats()
+    assert stats["db-0:27017"] == {"open": 1, "checked_out": 1, "waiting": 0, "cleared": 0, "saturated": False}
+    assert stats["db-1:27017"] == {"open": 2, "checked_out": 2, "waiting": 1, "cleared": 0, "saturated": True}
+
+    lines = monitor.render()
+    assert 'mongo_pool_saturated{server="db-1:27017"} 1' in lines
+    assert 'mongo_pool_saturated{server="db-0:27017"} 0' in lines
+    assert 'mongo_pool_waiting{server="db-1:27017"} 1' in lines
+
+
+def test_failed_checkout_stops_waiting():
+    monitor = PoolMonitor(max_size=1)
+    monitor.pool_created(event(PRIMARY))
+    monitor.connection_check_out_started(event(PRIMARY))
+    monitor.connection_check_out_failed(event(PRIMARY, reason="timeout"))
+    assert monitor.stats()["db-0:27017"]["waiting"] == 0
+
+
+def test_closed_pool_is_dropped():
+    monitor = PoolMonitor(max_size=1)
+    monitor.pool_created(event(SECONDARY))
+    check_out(monitor, SECONDARY)
+    monitor.pool_closed(event(SECONDARY))
+    monitor.connection_closed(event(SECONDARY))
+    assert monitor.stats() == {}
+
+
+def test_running_totals_render_as_counters(monkeypatch):
+    import metrics
+
+    monkeypatch.setattr(metrics, "_stats_sources", {})
+    monkeypatch.setattr(metrics, "_collectors", [])
+    metrics.register_stats(
+        "cache",
+        lambda: {"size": 3, "hits": 7, "flights": {"shared": 2, "in_flight": 1}},
+        counters=("hits", "flights_shared")
+    )
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE cache_hits_total counter" in lines
+    assert "cache_hits_total 7" in lines
+    assert "# TYPE cache_flights_shared_total counter" in lines
+    assert "# TYPE cache_size gauge" in lines
+    assert "# TYPE cache_flights_in_flight gauge" in lines
+    assert not any(line.startswith("cache_hits ") for line in lines)
+
+
+def test_pool_clears_render_as_a_counter():
+    monitor = PoolMonitor(max_size=1)
+    monitor.pool_created(event(PRIMARY))
+    monitor.pool_cleared(event(PRIMARY))
+
+    lines = monitor.render()
+    assert "# TYPE mongo_pool_cleared_total counter" in lines
+    assert 'mongo_pool_cleared_total{server="db-0:27017"} 1' in lines
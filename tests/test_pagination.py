@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+import base64
+import json
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+
+def raw_cursor(payload: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    "Sofa",
+    3,
+    1250.5,
+    datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+])
+def test_round_trip(value):
+    cursor = encode_cursor("-updated_at", value, "item_1")
+    assert decode_cursor(cursor, "-updated_at") == (value, "item_1")
+
+
+def test_rejects_other_sort():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("navn", "Sofa", "item_1"), "-updated_at")
+
+
+@pytest.mark.parametrize("value", [
+    {"$regex": "^(a+)+$"},
+    {"$foo": 1},
+    {"$date": "2024-05-01T12:30:00+00:00", "$ne": None},
+    {"$date": 5},
+    ["a"],
+    True,
+])
+def test_rejects_query_operators_and_other_types(value):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor({"s": "navn", "v": value, "id": "item_1"}), "navn")
+
+
+def test_rejects_garbage():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor!", "navn")
+
+
+def test_null_value_ascending_moves_on_to_non_null_values():
+    assert keyset_filter("verdi", 1, None, "item_2") == {"$or": [
+        {"verdi": None, "item_id": {"$gt": "item_2"}},
+        {"verdi": {"$ne": None}},
+    ]}
+
+
+def test_null_value_descending_stays_among_nulls():
+    # Nulls sort first, so they are the last thing a descending walk reaches
+    assert keyset_filter("verdi", -1, None, "item_2") == {"verdi": None, "item_id": {"$lt": "item_2"}}
+
+
+def test_descending_walk_reaches_nulls():
+    assert keyset_filter("verdi", -1, 10, "item_2") == {"$or": [
+        {"verdi": {"$lt": 10}},
+        {"verdi": 10, "item_id": {"$lt": "item_2"}},
+        {"verdi": None},
+    ]}
+
+
+def test_mixed_dates_descending_crosses_from_dates_to_strings():
+    value = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    branches = keyset_filter("updated_at", -1, value, "item_2", mixed_dates=True)["$or"]
+    assert {"updated_at": {"$type": "string"}} in branches
+
+
+def test_mixed_dates_ascending_crosses_from_strings_to_dates():
+    branches = keyset_filter("updated_at", 1, "2023-01-01T00:00:00+00:00", "item_2", mixed_dates=True)["$or"]
+    assert {"updated_at": {"$type": "date"}} in branches
+
+
+@pytest.mark.parametrize("value, direction", [
+    (datetime(2024, 5, 1, tzinfo=timezone.utc), 1),
+    ("2023-01-01T00:00:00+00:00", -1),
+])
+def test_mixed_dates_adds_no_branch_towards_the_same_type(value, direction):
+    plain = keyset_filter("updated_at", direction, value, "item_2")
+    assert keyset_filter("updated_at", direction, value, "item_2", mixed_dates=True) == plain
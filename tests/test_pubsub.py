@@ -0,0 +1,96 @@
+import asyncio
+
+from bson import ObjectId
+
+import pubsub
+from pubsub import MongoBackend
+
+
+class FakeCursor:
+    def __init__(self, docs, die_after=None):
+        self.docs = docs
+        self.die_after = die_after
+
+    def sort(self, key, direction):
+        # Only used as {$natural: -1}
+        self.docs = self.docs[::-1]
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+    async def __aiter__(self):
+        for n, doc in enumerate(self.docs):
+            if n == self.die_after:
+                raise RuntimeError("cursor killed")
+            yield doc
+
+
+class FakeCappedCollection:
+    """Documents in insertion (natural) order; each tailing cursor dies after ``die_after`` documents."""
+
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection=None, cursor_type=None):
+        docs = [doc for doc in self.docs if "_id" not in query or doc["_id"] > query["_id"]["$gt"]]
+        if cursor_type is None:
+            return FakeCursor(docs)
+        return FakeCursor(docs, die_after=len(docs))
+
+    async def count_documents(self, query, limit=0):
+        return int(any(doc["_id"] == query["_id"] for doc in self.docs))
+
+    def insert(self, object_id: str, message: str):
+        self.docs.append({"_id": ObjectId(object_id), "channel": "user_1", "message": message})
+
+
+def test_resume_does_not_skip_lower_object_ids_inserted_later(monkeypatch):
+    monkeypatch.setattr(pubsub, "TAIL_RETRY_SECONDS", 0)
+    collection = FakeCappedCollection()
+    backend = MongoBackend({"pubsub_messages": collection})
+    delivered = []
+
+    collection.insert("bbbbbbbbbbbbbbbbbbbbbbbb", "old")
+
+    async def scenario():
+        task = asyncio.create_task(backend._tail(lambda channel, message: delivered.append(message)))
+        await asyncio.sleep(0.01)
+        # Worker B's message, then one from worker A whose ObjectId sorts lower
+        collection.insert("cccccccccccccccccccccccc", "from b")
+        await asyncio.sleep(0.01)
+        collection.insert("aaaaaaaaaaaaaaaaaaaaaaaa", "from a")
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert delivered == ["from b", "from a"]
+
+
+def test_resume_after_falling_off_the_collection_delivers_what_is_left(monkeypatch):
+    monkeypatch.setattr(pubsub, "TAIL_RETRY_SECONDS", 0)
+    collection = FakeCappedCollection()
+    backend = MongoBackend({"pubsub_messages": collection})
+    delivered = []
+
+    collection.insert("aaaaaaaaaaaaaaaaaaaaaaaa", "seen")
+
+    async def scenario():
+        task = asyncio.create_task(backend._tail(lambda channel, message: delivered.append(message)))
+        await asyncio.sleep(0.01)
+        # Everything up to and including the last message seen rolls off
+        collection.docs = []
+        collection.insert("bbbbbbbbbbbbbbbbbbbbbbbb", "missed")
+        await asyncio.sleep(0.01)
+        collection.insert("cccccccccccccccccccccccc", "next")
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert delivered == ["missed", "next"]
@@ -0,0 +1,174 @@
+from dataclasses import dataclass, field
+from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import payments
+import server
+from timestamps import utcnow
+from webhooks import WebhookConsumer
+
+SECRET = "whsec_test"
+
+
+class FakeSigner:
+    """Signs payloads the way Stripe does: ``t=<ts>,v1=<hmac(t.body)>``."""
+
+    def __init__(self, secret: str = SECRET):
+        self.secret = secret
+
+    def _digest(self, timestamp: str, body: bytes) -> str:
+        return hmac.new(self.secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+
+    def sign(self, body: bytes) -> str:
+        timestamp = str(int(time.time()))
+        return f"t={timestamp},v1={self._digest(timestamp, body)}"
+
+    def verify(self, body: bytes, header: Optional[str]) -> bool:
+        parts = dict(part.split("=", 1) for part in (header or "").split(",") if "=" in part)
+        return "t" in parts and hmac.compare_digest(parts.get("v1", ""), self._digest(parts["t"], body))
+
+
+@dataclass
+class WebhookResponse:
+    event_type: str
+    event_id: str
+    session_id: str
+    payment_status: str
+    metadata: dict = field(default_factory=dict)
+
+
+class FakeStripeCheckout:
+    def __init__(self, signer: FakeSigner):
+        self.signer = signer
+
+    async def handle_webhook(self, body: bytes, signature: Optional[str]) -> WebhookResponse:
+        if not self.signer.verify(body, signature):
+            raise ValueError("Invalid signature")
+        return WebhookResponse(**json.loads(body))
+
+
+@pytest.fixture
+def app_db(monkeypatch):
+    db = AsyncMongoMockClient()["test_webhooks"]
+    signer = FakeSigner()
+    monkeypatch.setattr(payments, "_stripe_checkout", lambda api_key, webhook_url: FakeStripeCheckout(signer))
+    monkeypatch.setattr(server, "payments", payments.PaymentsClient(api_key="sk_test", webhook_url="http://test/webhook"))
+    monkeypatch.setattr(server, "db", db)
+    consumer = WebhookConsumer(db, server.apply_stripe_event)
+    monkeypatch.setattr(server, "webhook_consumer", consumer)
+    return db, signer, consumer
+
+
+def paid_event(event_id: str = "evt_1", session_id: str = "cs_1") -> bytes:
+    return json.dumps({
+        "event_type": "checkout.session.completed",
+        "event_id": event_id,
+        "session_id": session_id,
+        "payment_status": "paid",
+    }).encode()
+
+
+async def deliver(body: bytes, signature: str) -> httpx.Response:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/api/webhook/stripe", content=body, headers={"Stripe-Signature": signature})
+
+
+async def seed(db):
+    await db.stripe_events.create_index("event_key", unique=True)
+    await db.users.insert_one({"user_id": "user_1", "email": "a@example.com", "name": "A", "created_at": utcnow()})
+    await db.payment_transactions.insert_one({
+        "session_id": "cs_1", "user_id": "user_1", "package_id": "subscription",
+        "amount": 49.0, "currency": "nok", "payment_status": "pending",
+    })
+
+
+def test_rejects_bad_signature(app_db):
+    db, signer, consumer = app_db
+
+    async def scenario():
+        await seed(db)
+        response = await deliver(paid_event(), FakeSigner("whsec_other").sign(paid_event()))
+        assert response.status_code == 400
+        assert await db.stripe_events.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_event_is_acknowledged_without_new_work(app_db):
+    db, signer, consumer = app_db
+
+    async def scenario():
+        await seed(db)
+        body = paid_event()
+        first = await deliver(body, signer.sign(body))
+        assert first.status_code == 200
+        assert consumer._wake.is_set()
+
+        consumer._wake.clear()
+        retry = await deliver(body, signer.sign(body))
+        assert retry.status_code == 200
+        assert not consumer._wake.is_set()
+        assert await db.stripe_events.count_documents({}) == 1
+
+    asyncio.run(scenario())
+
+
+def test_consumer_completes_payment_once(app_db, monkeypatch):
+    db, signer, consumer = app_db
+    completed = []
+    complete_payment = server.complete_payment
+
+    async def counting_complete_payment(session_id):
+        completed.append(session_id)
+        return await complete_payment(session_id)
+
+    monkeypatch.setattr(server, "complete_payment", counting_complete_payment)
+
+    async def scenario():
+        await seed(db)
+        body = paid_event()
+        for _ in range(3):
+            await deliver(body, signer.sign(body))
+
+        assert await consumer.drain() == 1
+        assert await consumer.drain() == 0
+        assert completed == ["cs_1"]
+
+        event = await db.stripe_events.find_one({"event_key": "evt_1"})
+        assert event["status"] == "done"
+        transaction = await db.payment_transactions.find_one({"session_id": "cs_1"})
+        assert transaction["payment_status"] == "paid"
+
+    asyncio.run(scenario())
+
+
+def test_subscription_is_activated_once(app_db):
+    db, signer, consumer = app_db
+
+    async def scenario():
+        await seed(db)
+        # Stripe can send both the completed and the async-succeeded event for one session
+        for event_id in ("evt_1", "evt_2"):
+            body = paid_event(event_id)
+            await deliver(body, signer.sign(body))
+        assert await consumer.drain() == 2
+
+        user = await db.users.find_one({"user_id": "user_1"})
+        assert user["subscription_status"] == "active"
+        started_at = user["subscription_started_at"]
+
+        # Re-applying an already applied event, as after a consumer crash, changes nothing
+        await server.apply_stripe_event({"session_id": "cs_1", "event_type": "checkout.session.completed", "payment_status": "paid"})
+        user = await db.users.find_one({"user_id": "user_1"})
+        assert user["subscription_started_at"] == started_at
+
+    asyncio.run(scenario())